@@ -0,0 +1,162 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+"""
+
+import time
+import bisect
+import threading
+from collections import deque
+
+import requests
+
+from apps.config import Config
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+# 延迟直方图的桶上界 (毫秒)，最后一个桶收集更慢的请求
+HISTOGRAM_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """熔断器打开，请求未发出。继承 RequestException，现有的错误处理无需修改。"""
+
+class CircuitBreaker:
+    """
+    单个节点的熔断器与自适应超时。
+      - closed:    正常请求；连续失败 failure_threshold 次后 -> open
+      - open:      直接抛出 CircuitOpenError，不访问网络；reset_timeout 秒后 -> half_open
+      - half_open: 只放行一个探测请求，成功 -> closed，失败 -> open 且 reset_timeout 翻倍 (不超过 max_reset_timeout)
+    超时时间取最近 window 个请求延迟的 percentile 分位数乘以 multiplier，
+    限制在 [min_timeout, 调用方给出的上限] 之间；样本不足 min_samples 时使用上限。
+    超时的请求按上限计入延迟样本，节点变慢后超时会随之放宽；熔断打开时清空样本，
+    半开探测请求总是使用上限，避免按旧的 (过短的) 超时反复探测失败。
+    只有连接失败、超时和 5xx 计为失败，4xx / 非 JSON 响应说明节点在线。线程安全。
+    """
+
+    def __init__(self, base_url: str, failure_threshold: int = None, reset_timeout: float = None,
+                 max_reset_timeout: float = None, window: int = None, percentile: float = None,
+                 multiplier: float = None, min_timeout: float = None, min_samples: int = None):
+        self.base_url = base_url
+        self.failure_threshold = failure_threshold or Config.BREAKER_FAILURE_THRESHOLD
+        self.base_reset_timeout = reset_timeout or Config.BREAKER_RESET_TIMEOUT
+        self.max_reset_timeout = max_reset_timeout or Config.BREAKER_MAX_RESET_TIMEOUT
+        self.percentile = percentile or Config.BREAKER_TIMEOUT_PERCENTILE
+        self.multiplier = multiplier or Config.BREAKER_TIMEOUT_MULTIPLIER
+        self.min_timeout = min_timeout or Config.BREAKER_MIN_TIMEOUT
+        self.min_samples = min_samples or Config.BREAKER_MIN_SAMPLES
+
+        self.state = CLOSED
+        self.failures = 0
+        self.reset_timeout = self.base_reset_timeout
+        self.opened_at = None
+        self.last_error = None
+        self._probing = False
+        self._latencies = deque(maxlen=window or Config.BREAKER_WINDOW)
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.stats = {'success': 0, 'failure': 0, 'rejected': 0}
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """
+        请求发出前调用。
+        Returns:
+            bool: 本次请求是否为半开状态下的探测请求。
+        Raises:
+            CircuitOpenError: 熔断器打开，或半开状态下已有探测请求在进行。
+        """
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.stats['rejected'] += 1
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+        raise CircuitOpenError(f"节点 {self.base_url} 熔断中 ({retry_in:.0f} 秒后重试): {self.last_error}")
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+            self.histogram[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, latency * 1000)] += 1
+            self.stats['success'] += 1
+            self.failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                self.state = CLOSED
+                self.reset_timeout = self.base_reset_timeout
+
+    def record_failure(self, error, timed_out: float = None):
+        """
+        Args:
+            timed_out (float, optional): 请求超时时传入超时上限，作为一个延迟样本。
+        """
+        with self._lock:
+            if timed_out is not None:
+                self._latencies.append(timed_out)
+            self.stats['failure'] += 1
+            self.failures += 1
+            self.last_error = str(error)
+            if self.state == HALF_OPEN:
+                self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                # 打开前的延迟已不能反映节点现状，恢复后重新学习
+                self._latencies.clear()
+            self._probing = False
+
+    def latency_percentile(self, q: float) -> float:
+        """最近请求延迟的 q 分位数 (秒)，没有样本时返回 None。"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+    def timeout(self, ceiling: float, probe: bool = False) -> float:
+        """返回本次请求的超时 (秒)，不超过 ceiling；探测请求直接使用 ceiling。"""
+        if probe or len(self._latencies) < self.min_samples:
+            return ceiling
+        adaptive = self.latency_percentile(self.percentile) * self.multiplier
+        return min(ceiling, max(self.min_timeout, adaptive))
+
+    def to_dict(self):
+        percentiles = {f"p{q}": self.latency_percentile(q) for q in (50, 90, 99)}
+        timeout = self.timeout(Config.MIMOMESH_TIMEOUT)
+        with self._lock:
+            return {
+                'base_url': self.base_url,
+                'state': self.state,
+                'failures': self.failures,
+                'last_error': self.last_error,
+                'reset_timeout': self.reset_timeout,
+                'open_for': None if self.state == CLOSED or self.opened_at is None
+                            else round(time.monotonic() - self.opened_at, 1),
+                'timeout': round(timeout, 3),
+                'latency_ms': {name: None if value is None else round(value * 1000, 1)
+                               for name, value in percentiles.items()},
+                'histogram_ms': dict(zip([f"<={bound}" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}"],
+                                         self.histogram)),
+                'stats': dict(self.stats),
+            }
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(base_url: str) -> CircuitBreaker:
+    """返回 base_url 对应的共享熔断器。"""
+    key = base_url.rstrip('/')
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker(key)
+        return breaker
+
+def breaker_states() -> list:
+    """所有熔断器的状态，打开的排在前面。"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    order = {OPEN: 0, HALF_OPEN: 1, CLOSED: 2}
+    return sorted((breaker.to_dict() for breaker in breakers), key=lambda state: (order[state['state']], state['base_url']))
@@ -3,11 +3,33 @@
 Copyright (c) 2019 - present AppSeed.us
 """
 
+from datetime import datetime, timedelta
 from apps.charts import blueprint
-from flask import render_template
+from flask import render_template, request, jsonify
 from apps.models import Product
+from apps.telemetry import query_series
+from apps.exceptions.exception import InvalidUsage
 
 @blueprint.route('/charts')
 def charts():
     products = [{'name': product.name, 'price': product.price} for product in Product.get_list()]
-    return render_template('charts/index.html', segment='charts', products=products)
\ No newline at end of file
+    return render_template('charts/index.html', segment='charts', products=products)
+
+@blueprint.route('/charts/telemetry')
+def telemetry_series():
+    """ Telemetry series for ApexCharts, resolution picked from the requested range """
+    try:
+        end = datetime.fromisoformat(request.args['end']) if 'end' in request.args else datetime.utcnow()
+        start = datetime.fromisoformat(request.args['start']) if 'start' in request.args \
+            else end - timedelta(hours=request.args.get('hours', 24, type=float))
+        series = query_series(request.args['base_url'],
+                              request.args.get('field', 'battery'),
+                              start, end,
+                              max_points=request.args.get('points', 500, type=int))
+    except KeyError as e:
+        return jsonify({'message': f'missing parameter {e}'}), 400
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except InvalidUsage as e:
+        return jsonify(e.to_dict()), e.status_code
+    return jsonify(series)
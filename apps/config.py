@@ -19,6 +19,115 @@ class Config(object):
     CELERY_HOSTMACHINE    = "celery@app-generator"
     MIMOMESH_BASE_URL     = "http://192.168.1.87"
 
+    # MimoMesh HTTP client: request timeout (s), keep-alive pool size per device, connect retries
+    MIMOMESH_TIMEOUT      = float(os.getenv('MIMOMESH_TIMEOUT'  , 5))
+    MIMOMESH_POOL_SIZE    = int(os.getenv('MIMOMESH_POOL_SIZE'  , 8))
+    MIMOMESH_RETRIES      = int(os.getenv('MIMOMESH_RETRIES'    , 2))
+
+    # Fleet polling: worker threads, per-node timeout (s), whole-sweep deadline (s)
+    FLEET_MAX_WORKERS     = int(os.getenv('FLEET_MAX_WORKERS'   , 32))
+    FLEET_NODE_TIMEOUT    = float(os.getenv('FLEET_NODE_TIMEOUT', 3))
+    FLEET_DEADLINE        = float(os.getenv('FLEET_DEADLINE'    , 8))
+
+    # MimoMesh response cache: per-endpoint TTL (s), extra window (s) served stale while refreshing
+    MESHCACHE_TTLS        = {
+        'status' : float(os.getenv('MESHCACHE_STATUS_TTL' , 3)),
+        'config' : float(os.getenv('MESHCACHE_CONFIG_TTL' , 30)),
+        'version': float(os.getenv('MESHCACHE_VERSION_TTL', 3600)),
+    }
+    MESHCACHE_STALE       = float(os.getenv('MESHCACHE_STALE'   , 10))
+
+    # Live device stream (SSE): upstream poll interval (s), shared by all viewers of a device
+    STREAM_INTERVAL       = float(os.getenv('STREAM_INTERVAL'   , 1))
+    # Spectrum sweeps longer than this are min/max decimated before streaming (0 disables)
+    STREAM_SPECTRUM_POINTS = int(os.getenv('STREAM_SPECTRUM_POINTS', 1024))
+
+    # Spectrum archive: memory-mapped float32 frames per node, rotated by segment size, retained by size/age
+    SPECTRUM_ARCHIVE_DIR           = os.getenv('SPECTRUM_ARCHIVE_DIR', os.path.join(os.path.dirname(BASE_DIR), 'media', 'spectrum'))
+    SPECTRUM_ARCHIVE_INTERVAL      = float(os.getenv('SPECTRUM_ARCHIVE_INTERVAL', 5))
+    SPECTRUM_ARCHIVE_SEGMENT_BYTES = int(os.getenv('SPECTRUM_ARCHIVE_SEGMENT_BYTES', 64 * 1024 * 1024))
+    SPECTRUM_ARCHIVE_MAX_BYTES     = int(os.getenv('SPECTRUM_ARCHIVE_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+    SPECTRUM_ARCHIVE_MAX_AGE       = float(os.getenv('SPECTRUM_ARCHIVE_MAX_AGE', 24 * 3600))
+
+    # Spectrum statistics: EWMA weight, percentile histogram level range / step (dB), per-frame histogram decay,
+    # how far back (s) the archived frames are replayed into the statistics when they are read
+    SPECTRUM_STATS_ALPHA      = float(os.getenv('SPECTRUM_STATS_ALPHA', 0.1))
+    SPECTRUM_STATS_RANGE      = (-150.0, 0.0)
+    SPECTRUM_STATS_RESOLUTION = float(os.getenv('SPECTRUM_STATS_RESOLUTION', 1.0))
+    SPECTRUM_STATS_DECAY      = float(os.getenv('SPECTRUM_STATS_DECAY', 0.999))
+    SPECTRUM_STATS_CATCHUP    = float(os.getenv('SPECTRUM_STATS_CATCHUP', 3600))
+
+    # Waterfall tiles: rows per tile, max columns (frequency bins are max-pooled), colormap level range (dB),
+    # allowed resolutions (seconds per row)
+    WATERFALL_TILE_ROWS    = int(os.getenv('WATERFALL_TILE_ROWS' , 256))
+    WATERFALL_TILE_WIDTH   = int(os.getenv('WATERFALL_TILE_WIDTH', 1024))
+    WATERFALL_LEVELS       = (float(os.getenv('WATERFALL_LEVEL_MIN', -120)), float(os.getenv('WATERFALL_LEVEL_MAX', -40)))
+    WATERFALL_RESOLUTIONS  = (5, 15, 60, 300, 900, 3600)
+
+    # Interference detection: peak threshold / hysteresis clear level over baseline (dB),
+    # baseline EWMA weight, noise-floor percentile across bins, at most this many seconds of archive per run
+    # (new nodes, lost state), frames per detector batch (bounds memory)
+    INTERFERENCE_THRESHOLD_DB      = float(os.getenv('INTERFERENCE_THRESHOLD_DB', 10))
+    INTERFERENCE_CLEAR_DB          = float(os.getenv('INTERFERENCE_CLEAR_DB', 6))
+    INTERFERENCE_ALPHA             = float(os.getenv('INTERFERENCE_ALPHA', 0.05))
+    INTERFERENCE_FLOOR_PERCENTILE  = float(os.getenv('INTERFERENCE_FLOOR_PERCENTILE', 20))
+    INTERFERENCE_INTERVAL          = float(os.getenv('INTERFERENCE_INTERVAL', 30))
+    INTERFERENCE_MAX_BACKLOG       = float(os.getenv('INTERFERENCE_MAX_BACKLOG', 300))
+    INTERFERENCE_BATCH_FRAMES      = int(os.getenv('INTERFERENCE_BATCH_FRAMES', 1024))
+
+    # Per-node circuit breaker: consecutive failures to open, open period before a probe (doubles on failed probes
+    # up to the max), adaptive timeout = latency percentile of the last BREAKER_WINDOW calls x multiplier,
+    # never below BREAKER_MIN_TIMEOUT nor above MIMOMESH_TIMEOUT
+    BREAKER_FAILURE_THRESHOLD   = int(os.getenv('BREAKER_FAILURE_THRESHOLD'  , 3))
+    BREAKER_RESET_TIMEOUT       = float(os.getenv('BREAKER_RESET_TIMEOUT'    , 10))
+    BREAKER_MAX_RESET_TIMEOUT   = float(os.getenv('BREAKER_MAX_RESET_TIMEOUT', 300))
+    BREAKER_WINDOW              = int(os.getenv('BREAKER_WINDOW'             , 200))
+    BREAKER_MIN_SAMPLES         = int(os.getenv('BREAKER_MIN_SAMPLES'        , 20))
+    BREAKER_TIMEOUT_PERCENTILE  = float(os.getenv('BREAKER_TIMEOUT_PERCENTILE', 99))
+    BREAKER_TIMEOUT_MULTIPLIER  = float(os.getenv('BREAKER_TIMEOUT_MULTIPLIER', 3))
+    BREAKER_MIN_TIMEOUT         = float(os.getenv('BREAKER_MIN_TIMEOUT'      , 0.5))
+
+    # Group fan-out: worker threads shared by all group operations
+    GROUP_FANOUT_WORKERS = int(os.getenv('GROUP_FANOUT_WORKERS', 32))
+
+    # Config push: nodes written concurrently
+    CONFIG_PUSH_CONCURRENCY = int(os.getenv('CONFIG_PUSH_CONCURRENCY', 8))
+    # Write-behind config queue: delivery attempts before an entry is parked for manual resubmission
+    CONFIG_QUEUE_MAX_ATTEMPTS = int(os.getenv('CONFIG_QUEUE_MAX_ATTEMPTS', 5))
+
+    # Status history: a full keyframe every N samples per node, changed fields only in between
+    STATUS_HISTORY_KEYFRAME_EVERY = int(os.getenv('STATUS_HISTORY_KEYFRAME_EVERY', 60))
+
+    # Alert rules: seconds between checks of the alert_rules table for changes
+    ALERT_RELOAD_INTERVAL = float(os.getenv('ALERT_RELOAD_INTERVAL', 30))
+
+    # Mesh link-quality metrics: number of lowest-SNR links reported,
+    TOPOLOGY_WEAKEST_LINKS = int(os.getenv('TOPOLOGY_WEAKEST_LINKS', 5))
+    # largest mesh for which /devlist/links?matrix=1 returns the full hop-count / SNR matrices
+    TOPOLOGY_MATRIX_MAX    = int(os.getenv('TOPOLOGY_MATRIX_MAX', 500))
+
+    # Device registry sync from nodeInfos: last_seen is only rewritten once it is this old (s)
+    REGISTRY_SEEN_GRANULARITY = float(os.getenv('REGISTRY_SEEN_GRANULARITY', 300))
+
+    # Telemetry collector: beat interval (s), lock expiry (s) in case a worker dies mid-run.
+    # TELEMETRY_ADAPTIVE drops the beat entry in favour of the long-lived adaptive scheduler (python -m apps.scheduler)
+    TELEMETRY_INTERVAL    = float(os.getenv('TELEMETRY_INTERVAL', 60))
+    TELEMETRY_LOCK_TTL    = int(os.getenv('TELEMETRY_LOCK_TTL'  , 300))
+    TELEMETRY_ADAPTIVE    = (os.getenv('TELEMETRY_ADAPTIVE', 'False') == 'True')
+
+    # Adaptive scheduler: per-node interval bounds (s), growth factor while a node is stable, +/- jitter ratio,
+    # low battery level (%) and the interval cap below it, minimum status change that counts as activity,
+    # node list refresh / telemetry flush periods (s)
+    SCHEDULER_MIN_INTERVAL          = float(os.getenv('SCHEDULER_MIN_INTERVAL', 10))
+    SCHEDULER_MAX_INTERVAL          = float(os.getenv('SCHEDULER_MAX_INTERVAL', 600))
+    SCHEDULER_BACKOFF               = float(os.getenv('SCHEDULER_BACKOFF'     , 1.5))
+    SCHEDULER_JITTER                = float(os.getenv('SCHEDULER_JITTER'      , 0.1))
+    SCHEDULER_LOW_BATTERY           = float(os.getenv('SCHEDULER_LOW_BATTERY' , 20))
+    SCHEDULER_LOW_BATTERY_INTERVAL  = float(os.getenv('SCHEDULER_LOW_BATTERY_INTERVAL', 60))
+    SCHEDULER_CHANGE_THRESHOLDS     = {'batteryLevel': 1.0, 'temp': 1.0}
+    SCHEDULER_REFRESH               = float(os.getenv('SCHEDULER_REFRESH', 60))
+    SCHEDULER_FLUSH                 = float(os.getenv('SCHEDULER_FLUSH'  , 10))
+
     # Set up the App SECRET_KEY
     SECRET_KEY  = os.getenv('SECRET_KEY', 'S3cret_999')
 
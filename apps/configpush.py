@@ -0,0 +1,131 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from apps.config import Config
+from apps.meshapi import get_meshapi
+from apps.meshcache import get_cached_meshapi
+
+def config_diff(current: dict, desired: dict) -> dict:
+    """
+    计算最小配置差异：只保留 desired 中与设备当前配置不同 (或当前没有) 的键。
+    Args:
+        current (dict): 设备当前配置。
+        desired (dict): 期望配置 (可以只包含部分键)。
+    Returns:
+        dict: 需要下发的键值。
+    """
+    return {key: value for key, value in desired.items() if key not in current or current[key] != value}
+
+class PushResult:
+    """
+    单个节点一次配置下发的结果，timings 为各阶段耗时 (秒)：read / write / verify / total。
+    """
+    __slots__ = ('base_url', 'ok', 'changed', 'error', 'timings')
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.ok = False
+        self.changed = {}
+        self.error = None
+        self.timings = {}
+
+    def __repr__(self):
+        return f"<PushResult(base_url='{self.base_url}', ok={self.ok}, changed={list(self.changed)})>"
+
+    def to_dict(self):
+        return {
+            'base_url': self.base_url,
+            'ok': self.ok,
+            'changed': self.changed,
+            'error': self.error,
+            'timings_ms': {name: round(value * 1000, 1) for name, value in self.timings.items()},
+        }
+
+class ConfigPusher:
+    """
+    向多个节点并发下发配置，同时进行的节点数不超过 max_workers。
+    每个节点依次：读取当前配置 -> 计算差异 -> 只发送变化的键 -> 重新读取并校验；
+    没有差异的节点不发送任何写请求。读取和校验绕过仪表盘缓存，写入后使缓存失效。
+    """
+
+    def __init__(self, max_workers: int = None, timeout: float = None):
+        self.max_workers = max_workers or Config.CONFIG_PUSH_CONCURRENCY
+        self.timeout = timeout or Config.FLEET_NODE_TIMEOUT
+
+    def push_one(self, base_url: str, desired: dict) -> PushResult:
+        result = PushResult(base_url)
+        start = time.monotonic()
+        stage = 'read'
+        try:
+            client = get_meshapi(base_url)
+            current = client.get_config(timeout=self.timeout)
+            result.timings['read'] = time.monotonic() - start
+            result.changed = config_diff(current, desired)
+
+            if result.changed:
+                stage = 'write'
+                mark = time.monotonic()
+                get_cached_meshapi(base_url).set_config(result.changed)
+                result.timings['write'] = time.monotonic() - mark
+
+                stage = 'verify'
+                mark = time.monotonic()
+                # 不与进程内进行中的 GET 合并：那可能是写入前发出的请求，读到旧配置会误判校验失败
+                applied = client.get_config(timeout=self.timeout, coalesce=False)
+                result.timings['verify'] = time.monotonic() - mark
+                mismatched = config_diff(applied, result.changed)
+                if mismatched:
+                    raise ValueError(f"校验失败，未生效的配置项: {', '.join(map(str, mismatched))}")
+
+            result.ok = True
+        except Exception as e:
+            result.error = f"{stage}: {e}"
+        result.timings['total'] = time.monotonic() - start
+        return result
+
+    def push(self, base_urls: list, desired: dict, progress=None) -> list:
+        """
+        向 base_urls 下发 desired 配置。
+        Args:
+            base_urls (list): 节点地址列表。
+            desired (dict): 期望配置。
+            progress (callable, optional): 每完成一个节点调用一次 progress(result, done, total)。
+        Returns:
+            list: PushResult 列表，顺序与 base_urls 一致。
+        """
+        return self.push_many({base_url: desired for base_url in base_urls}, progress)
+
+    def push_many(self, targets: dict, progress=None) -> list:
+        """同 push()，但每个节点有各自的期望配置：targets 为 {base_url: desired}。"""
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(targets) or 1),
+                                thread_name_prefix='configpush') as executor:
+            futures = {executor.submit(self.push_one, base_url, desired): base_url
+                       for base_url, desired in targets.items()}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                if progress:
+                    progress(results[futures[future]], len(results), len(targets))
+        return [results[base_url] for base_url in targets]
+
+def push_config(base_urls: list, desired: dict, progress=None) -> dict:
+    """
+    下发配置并汇总结果。
+    Returns:
+        dict: 总耗时、成功 / 失败 / 无变化的节点数，以及每个节点的结果与分阶段耗时。
+    """
+    start = time.monotonic()
+    results = ConfigPusher().push(base_urls, desired, progress)
+    return {
+        'elapsed_ms': round((time.monotonic() - start) * 1000, 1),
+        'total': len(results),
+        'ok': sum(1 for r in results if r.ok),
+        'failed': sum(1 for r in results if not r.ok),
+        'unchanged': sum(1 for r in results if r.ok and not r.changed),
+        'nodes': [r.to_dict() for r in results],
+    }
@@ -0,0 +1,145 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+"""
+
+import json
+from datetime import datetime
+
+from sqlalchemy import insert, update, delete, select, bindparam
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+
+from apps import db
+from apps.config import Config
+from apps.models import PendingConfig
+from apps.configpush import ConfigPusher
+from apps.exceptions.exception import InvalidUsage
+
+_CHUNK = 500
+
+def _chunks(items: list, size: int = _CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _fail(e: SQLAlchemyError, status_code: int = 422):
+    db.session.rollback()
+    db.session.close()
+    raise InvalidUsage(str(e.__dict__.get('orig', e)), status_code)
+
+def enqueue_config(base_urls: list, changes: dict, now: datetime = None) -> int:
+    """
+    将配置修改放入待下发队列后立即返回，不访问设备。
+    同一节点同一键已有待下发的值时直接覆盖 (只保留最新值)，重置重试计数并把 version 加一。
+    并发提交同一个新 (节点, 键) 时后提交的一方违反唯一约束，重新读取后按覆盖处理一次；仍冲突时返回 409。
+    需要在 Flask 应用上下文中调用。
+    Returns:
+        int: 新增或覆盖的队列项数量。
+    """
+    now = now or datetime.utcnow()
+    if not base_urls or not changes:
+        return 0
+
+    try:
+        try:
+            return _enqueue(base_urls, changes, now)
+        except IntegrityError:
+            # 另一个请求刚插入了同一 (节点, 键)：回滚后重新读取，这次按覆盖处理
+            db.session.rollback()
+            return _enqueue(base_urls, changes, now)
+    except IntegrityError as e:
+        _fail(e, 409)
+    except SQLAlchemyError as e:
+        _fail(e)
+
+def _enqueue(base_urls: list, changes: dict, now: datetime) -> int:
+    """enqueue_config() 的一次尝试：读取已有项，新项 INSERT，已有项 UPDATE，然后提交。"""
+    existing = {}
+    for chunk in _chunks(list(base_urls)):
+        rows = db.session.execute(
+            select(PendingConfig.id, PendingConfig.base_url, PendingConfig.key)
+            .where(PendingConfig.base_url.in_(chunk), PendingConfig.key.in_(list(changes))))
+        existing.update({(row.base_url, row.key): row.id for row in rows})
+
+    inserts, updates = [], []
+    for base_url in base_urls:
+        for key, value in changes.items():
+            value = json.dumps(value)
+            if (base_url, key) in existing:
+                updates.append({'b_id': existing[(base_url, key)], 'b_value': value, 'b_updated': now})
+            else:
+                inserts.append({'base_url': base_url, 'key': key, 'value': value, 'created': now,
+                                'updated': now, 'attempts': 0, 'version': 0})
+    if inserts:
+        db.session.execute(insert(PendingConfig), inserts)
+    if updates:
+        # version 在数据库中自增，不依赖读到的旧值
+        table = PendingConfig.__table__
+        db.session.execute(update(table).where(table.c.id == bindparam('b_id'))
+                           .values(value=bindparam('b_value'), updated=bindparam('b_updated'), attempts=0,
+                                   last_error=None, version=table.c.version + 1), updates)
+    db.session.commit()
+    return len(inserts) + len(updates)
+
+def pending_config(base_urls: list = None) -> dict:
+    """
+    读取队列，返回 {base_url: {key: 队列项}}。
+    Args:
+        base_urls (list, optional): 只读取这些节点，默认全部。
+    """
+    query = select(PendingConfig).order_by(PendingConfig.base_url, PendingConfig.key)
+    chunks = _chunks(list(base_urls)) if base_urls is not None else [None]
+    queued = {}
+    for chunk in chunks:
+        statement = query if chunk is None else query.where(PendingConfig.base_url.in_(chunk))
+        for item in db.session.execute(statement).scalars():
+            queued.setdefault(item.base_url, {})[item.key] = item
+    return queued
+
+def deliver_pending(reachable: list, max_attempts: int = None) -> dict:
+    """
+    向刚刚轮询成功的节点下发它们的待下发配置：每个节点的所有键合并为一次差异下发并校验 (见 ConfigPusher)。
+    成功的队列项删除 (下发期间被再次修改的项保留，下一轮再发)；失败的项记录错误并增加重试计数，
+    达到 max_attempts 的项不再自动重试，需要重新提交。需要在 Flask 应用上下文中调用。
+    Args:
+        reachable (list): 本轮轮询成功的节点地址。
+    Returns:
+        dict: nodes / delivered / failed 计数。
+    """
+    max_attempts = max_attempts or Config.CONFIG_QUEUE_MAX_ATTEMPTS
+    queued = pending_config(reachable)
+    items = {base_url: [item for item in keys.values() if item.attempts < max_attempts]
+             for base_url, keys in queued.items()}
+    items = {base_url: batch for base_url, batch in items.items() if batch}
+    if not items:
+        return {'nodes': 0, 'delivered': 0, 'failed': 0}
+
+    targets = {base_url: {item.key: json.loads(item.value) for item in batch} for base_url, batch in items.items()}
+    # 下发前记下各项的版本，释放会话，避免网络请求期间占用数据库连接
+    versions = {base_url: [(item.id, item.version, item.attempts) for item in batch] for base_url, batch in items.items()}
+    db.session.commit()
+
+    results = ConfigPusher().push_many(targets)
+
+    done, failed = [], []
+    for result in results:
+        for id, version, attempts in versions[result.base_url]:
+            if result.ok:
+                done.append({'b_id': id, 'b_version': version})
+            else:
+                failed.append({'b_id': id, 'b_version': version, 'attempts': attempts + 1,
+                               'last_error': result.error})
+    try:
+        # 按 (id, version) 匹配的 executemany，使用 Core 表语句；不用 updated，DATETIME 在 MySQL 上只精确到秒
+        table = PendingConfig.__table__
+        condition = (table.c.id == bindparam('b_id')) & (table.c.version == bindparam('b_version'))
+        if done:
+            db.session.execute(delete(table).where(condition), done)
+        if failed:
+            db.session.execute(update(table).where(condition)
+                               .values(attempts=bindparam('attempts'), last_error=bindparam('last_error')), failed)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        _fail(e)
+
+    return {'nodes': len(results), 'delivered': sum(1 for r in results if r.ok),
+            'failed': sum(1 for r in results if not r.ok)}
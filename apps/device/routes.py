@@ -1,10 +1,30 @@
-from flask import render_template, redirect, request, url_for, flash, session
-from flask_login import current_user, login_user, logout_user
+import json
+import time
+from datetime import datetime
+from queue import Empty
+from flask import render_template, redirect, request, url_for, flash, session, jsonify, make_response, Response, stream_with_context
+from flask_login import current_user, login_user, logout_user, login_required
+from apps import db
 from apps.config import Config
-from apps.meshapi import MeshAPI
+from apps.meshapi import fetch_endpoints, get_flight_stats
+from apps.meshcache import get_cached_meshapi, get_cache_stats
+from apps.breaker import breaker_states
+from apps.fleet import poll_fleet, resolve_base_url, registered_base_urls
+from apps.configpush import push_config
+from apps.configqueue import enqueue_config, pending_config
+from apps.history import status_at
+from apps.alerts import compile_rule, KINDS
+from apps.exceptions.exception import InvalidUsage
+from apps.groups import group_members, iter_member_urls, fan_out, OPERATIONS
+from apps.spectrum import parse_spectrum, encode_spectrum, decimate_spectrum, SPECTRUM_MIMETYPE
+from apps.stream import get_device_stream
+from apps.topology import get_topology_tracker
+from apps.spectrum_stats import get_spectrum_stats
+from apps.spectrum_archive import get_archive
+from apps.waterfall import get_waterfall_renderer, PNG_MIMETYPE
 from apps.device import blueprint
 from apps.device.forms import DeviceStatusForm, freq_dict
-from apps.models import Company
+from apps.models import Company, Group, AlertRule, Alert
 
 @blueprint.route("/device", methods=['GET', 'POST'])
 def device():
@@ -12,14 +32,16 @@ def device():
     form = DeviceStatusForm()
     jsdata = {}
     jsconfdata = {}
-    # 仅在 GET 时访问设备接口
+    # 仅在 GET 时访问设备接口，status 与 config 并发获取，页面耗时取决于较慢的一个
     if request.method == 'GET':
-        try:
-            with MeshAPI(Config.MIMOMESH_BASE_URL) as msh:
-                jsdata = msh.get_status()
-                jsconfdata = msh.get_config()
-        except Exception as e:
-            flash(f"错误：无法获取设备状态 - {e}", 'error')
+        results = fetch_endpoints(Config.MIMOMESH_BASE_URL, 'status', 'config',
+                                  client=get_cached_meshapi(Config.MIMOMESH_BASE_URL))
+        errors = [result for result in results.values() if isinstance(result, Exception)]
+        if errors:
+            flash(f"错误：无法获取设备状态 - {errors[0]}", 'error')
+        else:
+            jsdata = results['status']
+            jsconfdata = results['config']
 
     if request.method == 'POST' and 'save' in request.form:
         try:
@@ -37,22 +59,306 @@ def device():
                 form_field = getattr(form, field_name)
                 form_field.data = value
 
-        form.freq.data = jsconfdata['freqList'][jsdata['operatingFreq']]
-        form.span.data = freq_dict.get(jsconfdata['span'], 0)
+        if jsdata and jsconfdata:
+            form.freq.data = jsconfdata['freqList'][jsdata['operatingFreq']]
+            form.span.data = freq_dict.get(jsconfdata['span'], 0)
 
     return render_template("device/device.html", form=form, raw_data=jsdata)
 
+@blueprint.route("/device/config/push", methods=['POST'])
+@login_required
+def device_config_push():
+    """
+    Push configuration to one or more nodes, sending only the keys that differ.
+    JSON body: {"config": {...}, "nodes": ["ip" | "base_url", ...] (default: all registered), "async": bool}
+    With async the push runs as a Celery task and the task id is returned (202).
+    """
+    payload = request.get_json(silent=True) or {}
+    desired = payload.get('config')
+    if not isinstance(desired, dict) or not desired:
+        return jsonify({'message': "缺少 config 配置项"}), 400
+
+    try:
+        nodes = payload.get('nodes')
+        base_urls = [resolve_base_url(node) for node in nodes] if nodes else registered_base_urls()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if payload.get('async'):
+        from apps.tasks import push_config as push_config_task
+        task = push_config_task.delay(json.dumps({'config': desired, 'nodes': base_urls}))
+        return jsonify({'task_id': task.id, 'nodes': base_urls}), 202
+
+    report = push_config(base_urls, desired)
+    return jsonify(report), 200 if not report['failed'] else 207
+
+@blueprint.route("/device/config/queue", methods=['GET', 'POST'])
+@login_required
+def device_config_queue():
+    """
+    Write-behind config changes. POST {"config": {...}, "nodes": [...]} queues the change and returns 202 at once,
+    it is delivered after the node's next successful poll. GET lists what is still queued.
+    """
+    if request.method == 'GET':
+        return jsonify({base_url: {key: {'value': json.loads(item.value), 'updated': item.updated.isoformat(),
+                                         'attempts': item.attempts, 'last_error': item.last_error}
+                                   for key, item in keys.items()}
+                        for base_url, keys in pending_config().items()})
+
+    payload = request.get_json(silent=True) or {}
+    changes = payload.get('config')
+    if not isinstance(changes, dict) or not changes:
+        return jsonify({'message': "缺少 config 配置项"}), 400
+    try:
+        nodes = payload.get('nodes')
+        base_urls = [resolve_base_url(node) for node in nodes] if nodes else registered_base_urls()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    try:
+        queued = enqueue_config(base_urls, changes)
+    except InvalidUsage as e:
+        return jsonify(e.to_dict()), e.status_code
+    return jsonify({'queued': queued, 'nodes': base_urls}), 202
+
+@blueprint.route("/device/group/<int:group_id>/members", methods=['GET'])
+@login_required
+def device_group_members(group_id):
+    """ Paginated group membership: ?page=&per_page= """
+    group = db.get_or_404(Group, group_id)
+    page = group_members(group.id, request.args.get('page', 1, type=int), request.args.get('per_page', 50, type=int))
+    return jsonify({
+        'group': group.name,
+        'page': page.page,
+        'pages': page.pages,
+        'total': page.total,
+        'members': [{'id': user.id, 'username': user.username, 'ip_address': user.ip_address,
+                     'devidce_id': user.devidce_id} for user in page.items],
+    })
+
+@blueprint.route("/device/group/<int:group_id>/<operation>", methods=['GET', 'POST'])
+@login_required
+def device_group_operation(group_id, operation):
+    """
+    Run status / version / config (GET) or apply (POST {"config": {...}}) on every member of a group.
+    Results stream back as newline-delimited JSON in completion order, the last line is the summary.
+    """
+    group = db.get_or_404(Group, group_id)
+    if operation not in OPERATIONS:
+        return jsonify({'message': f"未知的组操作: {operation}，可选 {', '.join(OPERATIONS)}"}), 404
+    payload = None
+    if operation == 'apply':
+        payload = (request.get_json(silent=True) or {}).get('config')
+        if request.method != 'POST' or not isinstance(payload, dict) or not payload:
+            return jsonify({'message': "apply 需要 POST {\"config\": {...}}"}), 400
+
+    def generate():
+        for result in fan_out(iter_member_urls(group.id), operation, payload):
+            yield json.dumps(result, ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'})
+
+@blueprint.route("/device/breakers", methods=['GET'])
+@login_required
+def device_breakers():
+    """ Per-node circuit breaker state, adaptive timeout and latency histogram, plus request coalescing / cache counters """
+    return jsonify({
+        'breakers': breaker_states(),
+        'flight': get_flight_stats(),
+        'cache': get_cache_stats(),
+    })
+
+@blueprint.route("/device/history", methods=['GET'])
+@login_required
+def device_history():
+    """ Device status as it was at ?t= (unix time, default now), rebuilt from the delta-compressed history """
+    try:
+        base_url = resolve_base_url(request.args.get('node'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    ts = datetime.utcfromtimestamp(request.args.get('t', time.time(), type=float))
+    status = status_at(base_url, ts)
+    if status is None:
+        return jsonify({'message': f"{base_url} 在该时间之前没有状态记录"}), 404
+    return jsonify({'node': base_url, 'ts': ts.isoformat(), 'status': status})
+
+@blueprint.route("/device/alerts", methods=['GET'])
+@login_required
+def device_alerts():
+    """ Open alerts, or with ?all=1 the most recent ones including cleared (?limit=, default 100) """
+    query = db.select(Alert).order_by(Alert.started.desc()).limit(min(request.args.get('limit', 100, type=int), 1000))
+    if not request.args.get('all', type=int):
+        query = query.where(Alert.cleared.is_(None))
+    return jsonify([{'id': alert.id, 'rule_id': alert.rule_id, 'node': alert.base_url, 'subject': alert.subject,
+                     'severity': alert.severity, 'message': alert.message, 'value': alert.value,
+                     'started': alert.started.isoformat(), 'cleared': alert.cleared and alert.cleared.isoformat()}
+                    for alert in db.session.execute(query).scalars()])
+
+@blueprint.route("/device/alerts/rules", methods=['GET', 'POST'])
+@login_required
+def device_alert_rules():
+    """
+    List alert rules, or create / update one with POST
+    {"id"?, "name", "kind": threshold|rate|dropout, "field", "op", "threshold", "clear", "window", "for_samples", ...}.
+    The rule is compiled before it is saved, the collector picks it up within ALERT_RELOAD_INTERVAL.
+    """
+    columns = ('name', 'kind', 'field', 'op', 'threshold', 'clear', 'window', 'for_samples',
+               'severity', 'base_url', 'enabled')
+    if request.method == 'GET':
+        return jsonify([{'id': rule.id, **{column: getattr(rule, column) for column in columns}}
+                        for rule in db.session.execute(db.select(AlertRule).order_by(AlertRule.id)).scalars()])
+
+    payload = request.get_json(silent=True) or {}
+    rule = db.get_or_404(AlertRule, payload['id']) if payload.get('id') else AlertRule(for_samples=1, enabled=True)
+    for column in columns:
+        if column in payload:
+            setattr(rule, column, payload[column])
+    if not rule.name or rule.kind not in KINDS:
+        return jsonify({'message': f"需要 name 和 kind ({', '.join(KINDS)})"}), 400
+    if not isinstance(rule.enabled, bool):
+        return jsonify({'message': f"enabled 应为 true / false，而不是 {rule.enabled!r}"}), 400
+    try:
+        compile_rule(rule)
+    except (ValueError, TypeError) as e:
+        return jsonify({'message': str(e)}), 400
+
+    rule.updated = datetime.utcnow()
+    db.session.add(rule)
+    db.session.commit()
+    return jsonify({'id': rule.id}), 200 if payload.get('id') else 201
+
 @blueprint.route("/devlist", methods=['GET'])
 def devlist():
     """ Render the device list page """
     node_infos = []
+    fleet = None
+    topology = None
+    links = None
     try:
-        with MeshAPI(Config.MIMOMESH_BASE_URL) as msh:
-            jsdata = msh.get_status()
-            if 'nodeInfos' in jsdata and isinstance(jsdata['nodeInfos'], list):
-                node_infos = jsdata['nodeInfos']
+        # 一次并发轮询所有已登记节点，合并各节点上报的 nodeInfos，与上一轮比较得出变化
+        fleet = poll_fleet()
+        table, topology = get_topology_tracker().update(fleet.node_infos())
+        node_infos = table.sorted()
+        # 链路指标在拓扑更新后于后台计算，这里只取最近一次算完的结果
+        links = get_topology_tracker().link_metrics()
+        if not fleet.ok:
+            flash(f"错误：无法获取节点列表 - {fleet.failed[0].error}", 'error')
     except Exception as e:
         flash(f"错误：无法获取节点列表 - {e}", 'error')
         
-    return render_template("device/devlist.html", node_infos=node_infos)
+    return render_template("device/devlist.html", node_infos=node_infos, fleet=fleet, topology=topology, links=links)
+
+@blueprint.route("/devlist/topology", methods=['GET'])
+def devlist_topology():
+    """ Topology changes since ?version= (as returned by the previous call), from the last /devlist poll """
+    return jsonify(get_topology_tracker().changes_since(request.args.get('version', -1, type=int)))
+
+@blueprint.route("/devlist/links", methods=['GET'])
+def devlist_links():
+    """
+    Mesh link-quality metrics of the last /devlist poll: components, diameter, articulation points, bridges and
+    the weakest links; ?matrix=1 adds the hop-count and SNR matrices (up to TOPOLOGY_MATRIX_MAX nodes).
+    Metrics are computed in the background after each topology change, 202 until the first result is ready.
+    """
+    tracker = get_topology_tracker()
+    metrics = tracker.link_metrics()
+    if metrics is None:
+        return jsonify({'version': tracker.version, 'pending': True}), 202
+    # links_version 落后于 tracker.links_version 时说明新快照的指标还在计算
+    return jsonify({'version': tracker.version, 'links_version': tracker.metrics_version(),
+                    'pending': tracker.metrics_version() != tracker.links_version,
+                    **metrics.to_dict(matrix=bool(request.args.get('matrix', type=int)))})
+
+@blueprint.route("/device/spectrum", methods=['GET'])
+def device_spectrum():
+    """
+    Latest spectrum sweep as a binary float32 frame (see apps.spectrum), ?points= decimates it.
+    ?trace=avg|peak|min|pNN returns the running statistics trace instead of the live sweep; the statistics take
+    every archived frame (archive_spectrum task, independent of viewers) plus the live stream's frames.
+    """
+    try:
+        base_url = resolve_base_url(request.args.get('node'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    trace = request.args.get('trace')
+    if trace:
+        stats = get_spectrum_stats(base_url)
+        stats.catch_up(get_archive(base_url))
+        try:
+            samples, start, step = stats.trace(trace), stats.start, stats.step
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 404
+    else:
+        try:
+            samples, start, step = parse_spectrum(get_cached_meshapi(base_url).get_spectrum())
+        except Exception as e:
+            return jsonify({'message': f"无法获取频谱数据 - {e}"}), 502
+
+    try:
+        samples, index = decimate_spectrum(samples, request.args.get('points', 0, type=int),
+                                           request.args.get('mode', 'minmax'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    response = make_response(encode_spectrum(samples, start, step, index))
+    response.headers['Content-Type'] = SPECTRUM_MIMETYPE
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@blueprint.route("/device/waterfall", methods=['GET'])
+def device_waterfall():
+    """
+    Waterfall PNG tile rendered from the spectrum archive (see apps.waterfall).
+    ?resolution= seconds per row, ?tile= tile index, or ?t= a unix time inside the wanted tile.
+    Time / frequency placement of the tile is returned in X-Waterfall-* headers.
+    """
+    try:
+        base_url = resolve_base_url(request.args.get('node'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    resolution = request.args.get('resolution', Config.WATERFALL_RESOLUTIONS[0], type=int)
+    if resolution not in Config.WATERFALL_RESOLUTIONS:
+        return jsonify({'message': f"不支持的分辨率: {resolution}，可选 {Config.WATERFALL_RESOLUTIONS}"}), 400
+
+    renderer = get_waterfall_renderer()
+    index = request.args.get('tile', type=int)
+    if index is None:
+        index = renderer.tile_index(request.args.get('t', time.time(), type=float), resolution)
+
+    tile = renderer.tile(get_archive(base_url), resolution, index)
+    response = make_response(tile.png)
+    response.headers['Content-Type'] = PNG_MIMETYPE
+    response.headers.update(tile.headers())
+    # 已封闭的瓦片内容不会再变化
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable' if tile.closed else 'no-cache'
+    return response
+
+@blueprint.route("/device/stream", methods=['GET'])
+def device_stream():
+    """ Server-Sent Events: full state on connect (and again after falling behind), then status/spectrum deltas.
+        Each open stream occupies a gunicorn thread for its whole lifetime, see `threads` in gunicorn-cfg.py """
+    try:
+        base_url = resolve_base_url(request.args.get('node'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    stream = get_device_stream(base_url)
+
+    def generate():
+        queue = stream.subscribe()
+        try:
+            while True:
+                try:
+                    yield queue.get(timeout=15)
+                except Empty:
+                    # SSE 注释行作为心跳，防止代理断开空闲连接
+                    yield ': keep-alive\n\n'
+        finally:
+            stream.unsubscribe(queue)
 
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -0,0 +1,175 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from apps.config import Config
+from apps.meshapi import get_meshapi
+from apps.meshcache import get_cached_meshapi
+from apps.models import DevUser
+
+class NodeResult:
+    """
+    单个节点一次轮询的结果。
+    """
+    __slots__ = ('base_url', 'ok', 'data', 'error', 'latency')
+
+    def __init__(self, base_url: str, ok: bool, data: dict = None, error: str = None, latency: float = None):
+        self.base_url = base_url
+        self.ok = ok
+        self.data = data or {}
+        self.error = error
+        self.latency = latency  # 秒；未完成 (超出截止时间) 时为 None
+
+    def __repr__(self):
+        return f"<NodeResult(base_url='{self.base_url}', ok={self.ok}, latency={self.latency})>"
+
+    def to_dict(self):
+        return {
+            'base_url': self.base_url,
+            'ok': self.ok,
+            'error': self.error,
+            'latency_ms': None if self.latency is None else round(self.latency * 1000, 1),
+        }
+
+class FleetSnapshot:
+    """
+    一次全网轮询的汇总结果。
+    """
+
+    def __init__(self, results: list, started: float, elapsed: float):
+        self.results = results
+        self.started = started
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> list:
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self) -> list:
+        return [r for r in self.results if not r.ok]
+
+    def slowest(self, count: int = 10) -> list:
+        """按延迟降序返回最慢的节点，未完成的节点排在最前。"""
+        return sorted(self.results, key=lambda r: float('inf') if r.latency is None else r.latency, reverse=True)[:count]
+
+    def node_infos(self) -> list:
+        """合并所有成功节点上报的 nodeInfos，按节点 id 去重。"""
+        merged = {}
+        for result in self.ok:
+            for info in result.data.get('nodeInfos') or []:
+                merged.setdefault(info.get('id'), info)
+        return list(merged.values())
+
+    def to_dict(self):
+        return {
+            'started': self.started,
+            'elapsed_ms': round(self.elapsed * 1000, 1),
+            'total': len(self.results),
+            'ok': len(self.ok),
+            'failed': len(self.failed),
+            'nodes': [r.to_dict() for r in self.results],
+        }
+
+class FleetPoller:
+    """
+    并发轮询多个 MimoMesh 节点。
+    线程池大小有上限；每个节点有独立超时，整轮轮询有截止时间 (deadline)，
+    超出截止时间仍未返回的节点记为失败，不会拖慢整轮结果。
+    """
+
+    def __init__(self, max_workers: int = None, node_timeout: float = None, deadline: float = None,
+                 use_cache: bool = True):
+        self.max_workers = max_workers or Config.FLEET_MAX_WORKERS
+        self.use_cache = use_cache
+        self.node_timeout = node_timeout or Config.FLEET_NODE_TIMEOUT
+        self.deadline = deadline or Config.FLEET_DEADLINE
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='fleet')
+
+    def _poll_one(self, base_url: str, endpoint: str, expires: float) -> NodeResult:
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            return NodeResult(base_url, False, error='超出轮询截止时间')
+
+        start = time.monotonic()
+        try:
+            client = get_cached_meshapi(base_url) if self.use_cache else get_meshapi(base_url)
+            data = getattr(client, f"get_{endpoint}")(timeout=min(self.node_timeout, remaining))
+            return NodeResult(base_url, True, data=data, latency=time.monotonic() - start)
+        except Exception as e:
+            return NodeResult(base_url, False, error=str(e), latency=time.monotonic() - start)
+
+    def poll(self, base_urls: list, endpoint: str = 'status') -> FleetSnapshot:
+        """
+        并发请求所有节点的同一端点。
+        Args:
+            base_urls (list): 节点地址列表。
+            endpoint (str): 端点名称，默认 "status"。
+        Returns:
+            FleetSnapshot: 结果顺序与 base_urls 一致。
+        """
+        started = time.time()
+        start = time.monotonic()
+        expires = start + self.deadline
+
+        futures = [self._executor.submit(self._poll_one, base_url, endpoint, expires) for base_url in base_urls]
+        wait(futures, timeout=self.deadline)
+
+        results = []
+        for base_url, future in zip(base_urls, futures):
+            if future.done():
+                results.append(future.result())
+            else:
+                future.cancel()
+                results.append(NodeResult(base_url, False, error='超出轮询截止时间'))
+
+        return FleetSnapshot(results, started, time.monotonic() - start)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+_poller = None
+_poller_lock = threading.Lock()
+
+def get_fleet_poller() -> FleetPoller:
+    """返回进程内共享的 FleetPoller。"""
+    global _poller
+    with _poller_lock:
+        if _poller is None:
+            _poller = FleetPoller()
+        return _poller
+
+def registered_base_urls() -> list:
+    """
+    从 DevUser 表读取所有已登记设备的地址；没有登记设备时回退到 Config.MIMOMESH_BASE_URL。
+    需要在 Flask 应用上下文中调用。
+    """
+    ips = [ip for (ip,) in DevUser.query.with_entities(DevUser.ip_address).order_by(DevUser.id)]
+    base_urls = [ip if ip.startswith('http') else f"http://{ip}" for ip in ips]
+    return list(dict.fromkeys(base_urls)) or [Config.MIMOMESH_BASE_URL]
+
+def resolve_base_url(value: str = None) -> str:
+    """
+    将请求参数中的节点地址解析为已登记设备的 base_url，避免服务端被当作任意 URL 的代理。
+    Args:
+        value (str, optional): IP 或 base_url；为空时返回 Config.MIMOMESH_BASE_URL。
+    Raises:
+        ValueError: 地址不是已登记的设备。
+    """
+    if not value:
+        return Config.MIMOMESH_BASE_URL
+    base_url = (value if value.startswith('http') else f"http://{value}").rstrip('/')
+    if base_url not in registered_base_urls():
+        raise ValueError(f"未登记的设备: {value}")
+    return base_url
+
+def poll_fleet(base_urls: list = None, endpoint: str = 'status') -> FleetSnapshot:
+    """使用共享 FleetPoller 轮询给定节点，默认轮询所有已登记设备。"""
+    if base_urls is None:
+        base_urls = registered_base_urls()
+    return get_fleet_poller().poll(base_urls, endpoint)
@@ -0,0 +1,100 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from sqlalchemy import select
+
+from apps import db
+from apps.config import Config
+from apps.models import DevUser
+from apps.meshcache import get_cached_meshapi
+from apps.configpush import ConfigPusher
+
+OPERATIONS = ('status', 'version', 'config', 'apply')
+
+# 所有组操作共用的有界线程池
+_executor = ThreadPoolExecutor(max_workers=Config.GROUP_FANOUT_WORKERS, thread_name_prefix='group')
+
+def _base_url(ip: str) -> str:
+    return (ip if ip.startswith('http') else f"http://{ip}").rstrip('/')
+
+def group_members(group_id: int, page: int = 1, per_page: int = 50):
+    """组成员分页查询 (按 id 排序)，返回 Flask-SQLAlchemy 的 Pagination。"""
+    statement = select(DevUser).where(DevUser.group_id == group_id).order_by(DevUser.id)
+    return db.paginate(statement, page=page, per_page=per_page, max_per_page=500, error_out=False)
+
+def iter_member_urls(group_id: int, batch: int = 500):
+    """按 id 键集分页逐批读取组成员地址，不会一次加载整个组。需要在 Flask 应用上下文中调用。"""
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(DevUser.id, DevUser.ip_address)
+            .where(DevUser.group_id == group_id, DevUser.id > last_id)
+            .order_by(DevUser.id).limit(batch)).all()
+        if not rows:
+            return
+        for row in rows:
+            yield _base_url(row.ip_address)
+        last_id = rows[-1].id
+
+def _run(base_url: str, operation: str, payload: dict) -> dict:
+    start = time.monotonic()
+    result = {'base_url': base_url, 'ok': False}
+    try:
+        if operation == 'apply':
+            pushed = ConfigPusher().push_one(base_url, payload)
+            result.update(ok=pushed.ok, changed=pushed.changed, error=pushed.error)
+        else:
+            client = get_cached_meshapi(base_url)
+            result.update(ok=True, data=getattr(client, f"get_{operation}")(timeout=Config.FLEET_NODE_TIMEOUT))
+    except Exception as e:
+        result['error'] = str(e)
+    result['latency_ms'] = round((time.monotonic() - start) * 1000, 1)
+    return result
+
+def fan_out(base_urls, operation: str, payload: dict = None, max_in_flight: int = None):
+    """
+    对一组节点并发执行同一操作，按完成顺序逐个产出结果，不等待最慢的节点。
+    base_urls 可以是惰性迭代器 (例如 iter_member_urls)，同时提交的任务不超过 max_in_flight 个，
+    大组不会一次占满线程池队列。
+    Args:
+        base_urls (iterable): 节点地址。
+        operation (str): status / version / config (读取)，apply (差异下发 payload 配置)。
+        payload (dict, optional): apply 的期望配置。
+    Yields:
+        dict: 每个节点的结果，最后一条为汇总 {'done': True, ...}。
+    Raises:
+        ValueError: 未知的操作，或 apply 缺少配置。
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"未知的组操作: {operation}，可选 {', '.join(OPERATIONS)}")
+    if operation == 'apply' and not payload:
+        raise ValueError("apply 操作需要 config 配置项")
+
+    max_in_flight = max_in_flight or Config.GROUP_FANOUT_WORKERS * 2
+    start = time.monotonic()
+    pending, total, ok = set(), 0, 0
+    urls = iter(base_urls)
+    exhausted = False
+    while pending or not exhausted:
+        while not exhausted and len(pending) < max_in_flight:
+            base_url = next(urls, None)
+            if base_url is None:
+                exhausted = True
+                break
+            pending.add(_executor.submit(_run, base_url, operation, payload))
+            total += 1
+        if not pending:
+            break
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            result = future.result()
+            ok += result['ok']
+            yield result
+
+    yield {'done': True, 'total': total, 'ok': ok, 'failed': total - ok,
+           'elapsed_ms': round((time.monotonic() - start) * 1000, 1)}
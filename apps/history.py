@@ -0,0 +1,232 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+"""
+
+import json
+import threading
+from datetime import datetime
+
+from sqlalchemy import insert, select, func
+from sqlalchemy.exc import SQLAlchemyError
+
+from apps import db
+from apps.config import Config
+from apps.models import StatusHistory
+from apps.exceptions.exception import InvalidUsage
+
+# 按 id 做逐项差异的列表字段 (列表项为带 id 的字典)
+KEYED_LISTS = ('nodeInfos',)
+
+def normalize(status: dict) -> dict:
+    """把 KEYED_LISTS 中的列表转换为 {str(id): 项} 字典，使差异能落到单个节点上。"""
+    state = dict(status)
+    for field in KEYED_LISTS:
+        items = state.get(field)
+        if isinstance(items, list) and all(isinstance(item, dict) and 'id' in item for item in items):
+            state[field] = {'__keyed__': [str(item['id']) for item in items],
+                            **{str(item['id']): item for item in items}}
+    return state
+
+def denormalize(state: dict) -> dict:
+    """normalize() 的逆操作，列表按原顺序还原。"""
+    status = dict(state)
+    for field in KEYED_LISTS:
+        keyed = status.get(field)
+        if isinstance(keyed, dict) and '__keyed__' in keyed:
+            status[field] = [keyed[key] for key in keyed['__keyed__']]
+    return status
+
+def make_delta(old: dict, new: dict) -> dict:
+    """
+    计算 old -> new 的差异：{'s': {键: 新值}, 'p': {键: 子差异}, 'd': [删除的键]}，空的部分省略。
+    两边都是字典的值递归比较，其余类型整体替换。
+    """
+    delta = {}
+    for key, value in new.items():
+        if key not in old:
+            delta.setdefault('s', {})[key] = value
+        elif old[key] != value:
+            if isinstance(value, dict) and isinstance(old[key], dict):
+                delta.setdefault('p', {})[key] = make_delta(old[key], value)
+            else:
+                delta.setdefault('s', {})[key] = value
+    removed = [key for key in old if key not in new]
+    if removed:
+        delta['d'] = removed
+    return delta
+
+def apply_delta(state: dict, delta: dict) -> dict:
+    """将 make_delta() 的结果应用到 state，返回新字典 (state 不变)。"""
+    result = dict(state)
+    for key in delta.get('d', ()):
+        result.pop(key, None)
+    result.update(delta.get('s', {}))
+    for key, sub in delta.get('p', {}).items():
+        result[key] = apply_delta(result.get(key) or {}, sub)
+    return result
+
+class StatusHistoryWriter:
+    """
+    把每次轮询的 status 转换为 status_history 行：每个节点每 keyframe_every 条写一次完整关键帧，
+    其间只写与上一条相比变化的字段。差异所依据的上一条状态保存在进程内，并记下写入后该节点最新一行的 id；
+    写入前按节点查询表中最新一行，不是本进程写的 (prefork 的其他子进程写过、进程重启) 就先写关键帧，
+    差异总是相对于表中真实的上一行。写入失败时清空状态，下一条重新从关键帧开始。线程安全。
+    """
+
+    def __init__(self, keyframe_every: int = None):
+        self.keyframe_every = keyframe_every or Config.STATUS_HISTORY_KEYFRAME_EVERY
+        self._states = {}   # base_url -> [上一条的规范化状态, 距上个关键帧的条数, 该节点最新一行的 id]
+        self._lock = threading.Lock()
+
+    def _row(self, base_url: str, ts: datetime, status: dict) -> dict:
+        state = normalize(status)
+        previous, count, head = self._states.get(base_url, (None, self.keyframe_every, None))
+        keyframe = previous is None or count >= self.keyframe_every
+        data = state if keyframe else make_delta(previous, state)
+        self._states[base_url] = [state, 0 if keyframe else count + 1, head]
+        return {'base_url': base_url, 'ts': ts, 'keyframe': keyframe,
+                'data': json.dumps(data, separators=(',', ':'), ensure_ascii=False)}
+
+    @staticmethod
+    def _heads(base_urls: list) -> dict:
+        heads = {}
+        for i in range(0, len(base_urls), 500):
+            heads.update(db.session.execute(
+                select(StatusHistory.base_url, func.max(StatusHistory.id))
+                .where(StatusHistory.base_url.in_(base_urls[i:i + 500])).group_by(StatusHistory.base_url)).all())
+        return heads
+
+    def reset(self):
+        with self._lock:
+            self._states.clear()
+
+    def store(self, samples: list) -> int:
+        """
+        批量写入 (base_url, ts, status) 列表，一条 executemany INSERT，前后各一条按节点分组的最新 id 查询。
+        需要在 Flask 应用上下文中调用。
+        Returns:
+            int: 写入的行数。
+        """
+        if not samples:
+            return 0
+        base_urls = list(dict.fromkeys(base_url for base_url, ts, status in samples))
+        with self._lock:
+            try:
+                heads = self._heads(base_urls)
+                for base_url in base_urls:
+                    state = self._states.get(base_url)
+                    if state is not None and state[2] != heads.get(base_url):
+                        del self._states[base_url]
+                rows = [self._row(base_url, ts, status) for base_url, ts, status in samples]
+                db.session.execute(insert(StatusHistory), rows)
+                for base_url, head in self._heads(base_urls).items():
+                    self._states[base_url][2] = head
+                db.session.commit()
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                db.session.close()
+                self._states.clear()
+                raise InvalidUsage(str(e.__dict__.get('orig', e)), 422)
+        return len(rows)
+
+_writer = StatusHistoryWriter()
+
+def get_history_writer() -> StatusHistoryWriter:
+    """进程内共享的写入器 (collect_telemetry / 自适应调度器使用)。"""
+    return _writer
+
+def status_at(base_url: str, ts: datetime) -> dict:
+    """
+    重建节点在 ts 时刻 (含) 的 status：取不晚于 ts 的最近关键帧，依次应用其后到 ts 为止的差异。
+    需要在 Flask 应用上下文中调用。
+    Returns:
+        dict: status；ts 之前没有记录时返回 None。
+    """
+    keyframe = db.session.execute(
+        select(StatusHistory.id, StatusHistory.data)
+        .where(StatusHistory.base_url == base_url, StatusHistory.keyframe.is_(True), StatusHistory.ts <= ts)
+        .order_by(StatusHistory.ts.desc(), StatusHistory.id.desc()).limit(1)).first()
+    if keyframe is None:
+        return None
+
+    state = json.loads(keyframe.data)
+    deltas = db.session.execute(
+        select(StatusHistory.keyframe, StatusHistory.data)
+        .where(StatusHistory.base_url == base_url, StatusHistory.id > keyframe.id, StatusHistory.ts <= ts)
+        .order_by(StatusHistory.id))
+    for row in deltas:
+        # 关键帧之后又出现关键帧 (同一时间戳的写入) 时以新关键帧为准
+        state = json.loads(row.data) if row.keyframe else apply_delta(state, json.loads(row.data))
+    return denormalize(state)
+
+def status_range(base_url: str, start: datetime, end: datetime):
+    """
+    逐条重建 [start, end] 内的 status，只读取一次起点关键帧，之后顺序应用差异。
+    Yields:
+        tuple: (ts, status)
+    """
+    keyframe = db.session.execute(
+        select(StatusHistory.id, StatusHistory.ts)
+        .where(StatusHistory.base_url == base_url, StatusHistory.keyframe.is_(True), StatusHistory.ts <= start)
+        .order_by(StatusHistory.ts.desc(), StatusHistory.id.desc()).limit(1)).first()
+    query = select(StatusHistory.ts, StatusHistory.keyframe, StatusHistory.data) \
+        .where(StatusHistory.base_url == base_url, StatusHistory.ts <= end).order_by(StatusHistory.id)
+    query = query.where(StatusHistory.id >= keyframe.id) if keyframe else query.where(StatusHistory.ts >= start)
+
+    state = None
+    for row in db.session.execute(query):
+        if row.keyframe:
+            state = json.loads(row.data)
+        elif state is None:
+            continue    # 范围开头没有关键帧可依托的差异
+        else:
+            state = apply_delta(state, json.loads(row.data))
+        if row.ts >= start:
+            yield row.ts, denormalize(state)
+
+def _benchmark(nodes: int = 20, polls: int = 1440, reads: int = 200):
+    """
+    基准：用模拟器生成 nodes 个节点各 polls 次的 status，分别按 关键帧 + 差异 和 每条都是完整快照
+    (keyframe_every=1) 写入内存 SQLite，比较存储大小和 status_at 随机读取延迟。
+    """
+    import time
+    import random
+    from datetime import timedelta
+    from apps import create_app
+    from apps.config import config_dict
+    from apps.simulator import SimulatedNode
+
+    config = config_dict['Debug']
+    config.SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    app = create_app(config)
+
+    mesh = []
+    for index in range(nodes):
+        mesh.append(SimulatedNode(index, mesh, 64))
+    base = datetime(2025, 1, 1)
+    samples = [(f"http://sim/{node.index}", base + timedelta(minutes=i), node.status())
+               for i in range(polls) for node in mesh]
+
+    print(f"--- status 历史基准 ({nodes} 节点 x {polls} 次轮询, 随机读取 {reads} 次) ---")
+    with app.app_context():
+        db.create_all()
+        rng = random.Random(0)
+        for label, every in (('完整快照', 1), ('关键帧 + 差异', Config.STATUS_HISTORY_KEYFRAME_EVERY)):
+            db.session.execute(StatusHistory.__table__.delete())
+            writer = StatusHistoryWriter(every)
+            start = time.perf_counter()
+            for i in range(0, len(samples), 1000):
+                writer.store(samples[i:i + 1000])
+            write = time.perf_counter() - start
+            size = db.session.execute(select(db.func.sum(db.func.length(StatusHistory.data)))).scalar()
+
+            start = time.perf_counter()
+            for _ in range(reads):
+                base_url, ts, status = samples[rng.randrange(len(samples))]
+                assert status_at(base_url, ts) == status
+            read = (time.perf_counter() - start) / reads * 1000
+            print(f"{label:8s}: {size / 1024 / 1024:7.2f} MB, 写入 {write:5.2f} s, status_at {read:6.2f} ms/次")
+
+if __name__ == "__main__":
+    _benchmark()
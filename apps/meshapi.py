@@ -1,35 +1,116 @@
 import requests
 import json
+import time
+import asyncio
+import threading
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from apps.config import Config
+from apps.singleflight import SingleFlight, WaitTimeout
+from apps.breaker import get_breaker
+
+# 连接池与重试的默认参数，见 Config.MIMOMESH_*
+DEFAULT_TIMEOUT   = Config.MIMOMESH_TIMEOUT
+DEFAULT_POOL_SIZE = Config.MIMOMESH_POOL_SIZE
+DEFAULT_RETRIES   = Config.MIMOMESH_RETRIES
+
+# 进程内共享的请求合并器，key 为 (base_url, endpoint)
+_flight = SingleFlight()
+
+def get_flight_stats() -> dict:
+    """返回请求合并计数：issued 为实际发出的上游请求数，coalesced 为被合并的调用数。"""
+    return dict(_flight.stats, in_flight=_flight.in_flight())
+
+def build_session(pool_size: int = DEFAULT_POOL_SIZE, retries: int = DEFAULT_RETRIES) -> requests.Session:
+    """
+    创建带连接池 (keep-alive) 和重试策略的 requests.Session。
+    Args:
+        pool_size (int): 每个主机保持的最大连接数。
+        retries (int): 连接失败 / 5xx 时的重试次数，仅对幂等的 GET 生效。
+    Returns:
+        requests.Session: 配置好的会话对象。
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        backoff_factor=0.1,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry, pool_block=False)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
 
 class MeshAPI:
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, timeout: float = DEFAULT_TIMEOUT,
+                 pool_size: int = DEFAULT_POOL_SIZE, retries: int = DEFAULT_RETRIES):
         self.base_url = base_url.rstrip('/')
         self.headers = {
             'Content-Type': 'application/json'
         }
+        self.timeout = timeout
+        self.session = build_session(pool_size, retries)
+        # 节点级熔断器与自适应超时，同一地址的客户端共享
+        self.breaker = get_breaker(self.base_url)
+        # 由 get_meshapi() 创建的共享实例在 with 块结束时不关闭连接池
+        self._shared = False
     
     def __enter__(self):
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self._shared:
+            self.close()
         return False
 
-    def _get_request(self, endpoint: str, params: dict = None):
+    def close(self):
+        """关闭底层连接池。"""
+        self.session.close()
+
+    def _get_request(self, endpoint: str, params: dict = None, timeout: float = None, coalesce: bool = True):
         """
         内部方法：发送实际的 HTTP GET 请求。
         Args:
             endpoint (str): API 端点，例如 "/status" 或 "/version"。
             params (dict, optional): 查询参数。
+            timeout (float, optional): 本次请求的超时 (秒)，默认使用 self.timeout。
+            coalesce (bool, optional): 是否与进程内进行中的相同请求合并；写入后的校验读取必须为 False，
+                否则可能拿到写入前发出的请求的结果。
         Returns:
             dict: API 响应的 JSON 数据。
         Raises:
             requests.exceptions.RequestException: 网络或 HTTP 错误。
             ValueError: 非 JSON 响应。
         """
+        # 无查询参数的相同请求在进程内合并为一次上游调用
+        if params is None and coalesce:
+            # 合并到别人发起的请求时也不超过本次调用的超时
+            try:
+                return _flight.do((self.base_url, endpoint.lstrip('/')), self._send_get_request,
+                                  endpoint, params, timeout, timeout=timeout or self.timeout)
+            except WaitTimeout as e:
+                raise requests.exceptions.Timeout(f"MimoMesh API 请求超时: {self.base_url}/{endpoint.lstrip('/')} ({e})") from e
+        return self._send_get_request(endpoint, params, timeout)
+
+    def _send_get_request(self, endpoint: str, params: dict = None, timeout: float = None):
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
 
+        # 熔断器打开时直接抛出 CircuitOpenError；超时取调用方上限与节点历史延迟推算值中较小的一个
+        ceiling = timeout or self.timeout
+        probe = self.breaker.before_call()
+        timeout = self.breaker.timeout(ceiling, probe)
+        start = time.monotonic()
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=5)
+            response = self.session.get(url, headers=self.headers, params=params, timeout=timeout)
+            if response.status_code >= 500:
+                self.breaker.record_failure(f"HTTP {response.status_code}")
+            else:
+                self.breaker.record_success(time.monotonic() - start)
             response.raise_for_status()
 
             if response.text:
@@ -42,33 +123,38 @@ class MeshAPI:
             )
             raise requests.exceptions.RequestException(error_message) from e
         except requests.exceptions.ConnectionError as e:
+            self.breaker.record_failure(e)
             error_message = f"无法连接到 MimoMesh 设备: {self.base_url} - {e}"
             raise requests.exceptions.RequestException(error_message) from e
         except requests.exceptions.Timeout as e:
-            error_message = f"MimoMesh API 请求超时: {url} - {e}"
+            self.breaker.record_failure(e, timed_out=ceiling)
+            error_message = f"MimoMesh API 请求超时 ({timeout:.2f}s): {url} - {e}"
             raise requests.exceptions.RequestException(error_message) from e
         except json.JSONDecodeError as e:
             error_message = f"MimoMesh API 响应不是有效的 JSON: {url} - {e}, 响应内容: {response.text}"
             raise ValueError(error_message) from e
         except Exception as e:
+            # 其余异常发生在收到响应之前时也要结束半开探测
+            if not isinstance(e, requests.exceptions.RequestException) or e.response is None:
+                self.breaker.record_failure(e)
             error_message = f"MimoMesh API 请求发生未知错误: {e}"
             raise requests.exceptions.RequestException(error_message) from e
 
-    def get_status(self):
-        """获取设备状态。"""
-        return self._get_request("status")
+    def get_status(self, timeout: float = None, coalesce: bool = True):
+        """获取设备状态；coalesce=False 时总是发出新的请求 (见 _get_request)。"""
+        return self._get_request("status", timeout=timeout, coalesce=coalesce)
 
-    def get_version(self):
-        """获取设备版本信息。"""
-        return self._get_request("version")
+    def get_version(self, timeout: float = None, coalesce: bool = True):
+        """获取设备版本信息；coalesce=False 时总是发出新的请求 (见 _get_request)。"""
+        return self._get_request("version", timeout=timeout, coalesce=coalesce)
 
-    def get_spectrum(self):
+    def get_spectrum(self, timeout: float = None):
         """获取频谱数据。"""
-        return self._get_request("spectrum")
+        return self._get_request("spectrum", timeout=timeout)
 
-    def get_config(self):
-        """获取设备配置。"""
-        return self._get_request("config")
+    def get_config(self, timeout: float = None, coalesce: bool = True):
+        """获取设备配置；coalesce=False 时总是发出新的请求 (见 _get_request)。"""
+        return self._get_request("config", timeout=timeout, coalesce=coalesce)
     
     def set_config(self, config_data: dict):
         """
@@ -82,17 +168,178 @@ class MeshAPI:
             ValueError: 非 JSON 响应。
         """
         url = f"{self.base_url}/config"
+        # 写操作同样在熔断时快速失败，但使用固定超时：写入通常比读取慢
+        self.breaker.before_call()
+        start = time.monotonic()
         try:
-            response = requests.post(url, headers=self.headers, json=config_data, timeout=5)
+            response = self.session.post(url, headers=self.headers, json=config_data, timeout=self.timeout)
+            if response.status_code >= 500:
+                self.breaker.record_failure(f"HTTP {response.status_code}")
+            else:
+                self.breaker.record_success(time.monotonic() - start)
             response.raise_for_status()
 
             if response.text:
                 return response.json()
             return {}
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            self.breaker.record_failure(e)
+            raise e
         except requests.exceptions.RequestException as e:
             raise e
-    
+
+# 进程级客户端注册表：按 base_url 复用 MeshAPI（及其连接池），跨请求、跨 gunicorn 线程共享
+_registry = {}
+_registry_lock = threading.Lock()
+
+def get_meshapi(base_url: str, **kwargs) -> MeshAPI:
+    """
+    获取 base_url 对应的共享 MeshAPI 客户端，不存在时创建。
+    Args:
+        base_url (str): 设备地址，例如 "http://192.168.1.87"。
+        **kwargs: 首次创建时传给 MeshAPI 的参数 (timeout / pool_size / retries)。
+    Returns:
+        MeshAPI: 共享客户端，with 块结束时不会关闭连接。
+    """
+    key = base_url.rstrip('/')
+    client = _registry.get(key)
+    if client is not None:
+        return client
+
+    with _registry_lock:
+        client = _registry.get(key)
+        if client is None:
+            client = MeshAPI(key, **kwargs)
+            client._shared = True
+            _registry[key] = client
+        return client
+
+def close_all():
+    """关闭并清空注册表中的所有客户端。"""
+    with _registry_lock:
+        for client in _registry.values():
+            client.close()
+        _registry.clear()
+
+class AsyncMeshAPI:
+    """
+    MeshAPI 的 asyncio 版本，方法与 MeshAPI 相同但均为协程。
+    阻塞的 HTTP 调用在线程中执行并复用共享客户端的连接池，多个端点可以并发等待。
+    """
+    ENDPOINTS = ('status', 'version', 'spectrum', 'config')
+
+    def __init__(self, base_url: str, client=None):
+        # client 可以是 MeshAPI 或任何具有相同方法的包装 (例如 CachedMeshAPI)
+        self._client = client or get_meshapi(base_url)
+        self.base_url = self._client.base_url
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    async def get_status(self):
+        """获取设备状态。"""
+        return await asyncio.to_thread(self._client.get_status)
+
+    async def get_version(self):
+        """获取设备版本信息。"""
+        return await asyncio.to_thread(self._client.get_version)
+
+    async def get_spectrum(self):
+        """获取频谱数据。"""
+        return await asyncio.to_thread(self._client.get_spectrum)
+
+    async def get_config(self):
+        """获取设备配置。"""
+        return await asyncio.to_thread(self._client.get_config)
+
+    async def set_config(self, config_data: dict):
+        """设置设备配置。"""
+        return await asyncio.to_thread(self._client.set_config, config_data)
+
+    async def gather(self, *endpoints: str) -> dict:
+        """
+        并发请求多个端点，总耗时约等于最慢的一个而不是各端点之和。
+        Args:
+            *endpoints (str): 端点名称，取值见 ENDPOINTS。
+        Returns:
+            dict: 端点名称 -> 响应数据；请求失败的端点对应其异常对象。
+        """
+        for endpoint in endpoints:
+            if endpoint not in self.ENDPOINTS:
+                raise ValueError(f"未知的 MimoMesh 端点: {endpoint}")
+
+        results = await asyncio.gather(
+            *(getattr(self, f"get_{endpoint}")() for endpoint in endpoints),
+            return_exceptions=True
+        )
+        return dict(zip(endpoints, results))
+
+def fetch_endpoints(base_url: str, *endpoints: str, client=None) -> dict:
+    """
+    供同步 Flask 路由使用：在新的事件循环中并发获取多个端点。
+    Args:
+        base_url (str): 设备地址。
+        *endpoints (str): 端点名称，例如 "status", "config"。
+        client (optional): 实际发请求的客户端，默认 get_meshapi(base_url)。
+    Returns:
+        dict: 端点名称 -> 响应数据或异常对象，见 AsyncMeshAPI.gather。
+    """
+    return asyncio.run(AsyncMeshAPI(base_url, client).gather(*endpoints))
+
+def _benchmark(calls: int = 200):
+    """
+    微基准：对本地模拟设备比较每次新建连接 (requests.get) 与连接池复用的单次调用延迟。
+    """
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    body = json.dumps({'name': 'bench', 'batteryLevel': 88.5, 'nodeInfos': []}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def run(fn):
+        fn()  # 预热
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        return (time.perf_counter() - start) / calls * 1000
+
+    before = run(lambda: requests.get(f"{base_url}/status", timeout=DEFAULT_TIMEOUT).json())
+    client = get_meshapi(base_url)
+    after = run(client.get_status)
+
+    print(f"--- MeshAPI 微基准 ({calls} 次 GET /status) ---")
+    print(f"每次新建连接: {before:.3f} ms/次")
+    print(f"连接池复用:   {after:.3f} ms/次 ({before / after:.1f}x)")
+
+    close_all()
+    server.shutdown()
+
 if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        _benchmark()
+        sys.exit(0)
+
     # 替换为你的 MimoMesh 设备的实际 IP 地址
     MIMOMESH_BASE_URL = "http://192.168.1.87" 
     
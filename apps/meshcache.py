@@ -0,0 +1,149 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from apps.config import Config
+from apps.meshapi import MeshAPI, get_meshapi
+from apps.breaker import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+# 后台刷新共用的线程池
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='meshcache')
+
+class CachedMeshAPI:
+    """
+    MeshAPI 的缓存包装，按端点设置 TTL，支持 stale-while-revalidate：
+      - 缓存未过期：直接返回；
+      - 过期但仍在 stale 窗口内：立即返回旧数据，并在后台刷新；
+      - 超出 stale 窗口或无缓存：同步请求设备；
+      - 节点熔断中：有任何旧数据都直接返回 (fallback)，没有时抛出 CircuitOpenError。
+    set_config 后会使 config / status 缓存失效。每个端点有一个代数，invalidate() 时加一：
+    失效前已经发出的请求 (包括后台刷新) 返回的旧数据不再写入缓存；失效后的第一次请求不与进程内
+    进行中的相同请求合并，那可能是失效前发出的。
+    """
+
+    def __init__(self, client: MeshAPI, ttls: dict = None, stale: float = None):
+        self._client = client
+        self.base_url = client.base_url
+        self.ttls = ttls or Config.MESHCACHE_TTLS
+        self.stale = Config.MESHCACHE_STALE if stale is None else stale
+
+        self._entries = {}       # endpoint -> (data, fetched_at)
+        self._generations = {}   # endpoint -> 失效次数
+        self._invalidated = set()    # 失效后还没有成功取回新数据的端点
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.stats = {'hit': 0, 'stale': 0, 'miss': 0, 'fallback': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def _fetch(self, endpoint: str, timeout: float = None):
+        with self._lock:
+            generation = self._generations.get(endpoint, 0)
+            coalesce = endpoint not in self._invalidated
+        data = getattr(self._client, f"get_{endpoint}")(timeout=timeout, coalesce=coalesce)
+        with self._lock:
+            if self._generations.get(endpoint, 0) == generation:
+                self._entries[endpoint] = (data, time.monotonic())
+                self._invalidated.discard(endpoint)
+        return data
+
+    def _refresh(self, endpoint: str):
+        try:
+            self._fetch(endpoint)
+        except Exception as e:
+            logger.warning(f"后台刷新 {self.base_url}/{endpoint} 失败: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(endpoint)
+
+    def _get(self, endpoint: str, timeout: float = None):
+        ttl = self.ttls[endpoint]
+        with self._lock:
+            entry = self._entries.get(endpoint)
+            if entry is not None:
+                data, fetched_at = entry
+                age = time.monotonic() - fetched_at
+                if age < ttl:
+                    self.stats['hit'] += 1
+                    return data
+                if age < ttl + self.stale:
+                    self.stats['stale'] += 1
+                    if endpoint not in self._refreshing:
+                        self._refreshing.add(endpoint)
+                        _refresh_executor.submit(self._refresh, endpoint)
+                    return data
+            self.stats['miss'] += 1
+
+        try:
+            return self._fetch(endpoint, timeout)
+        except CircuitOpenError:
+            if entry is None:
+                raise
+            with self._lock:
+                self.stats['fallback'] += 1
+            return entry[0]
+
+    def invalidate(self, *endpoints: str):
+        """清除指定端点的缓存，不传参数时清除全部。"""
+        with self._lock:
+            for endpoint in endpoints or list(self.ttls):
+                self._entries.pop(endpoint, None)
+                self._generations[endpoint] = self._generations.get(endpoint, 0) + 1
+                self._invalidated.add(endpoint)
+
+    def get_status(self, timeout: float = None):
+        """获取设备状态 (缓存)。"""
+        return self._get('status', timeout)
+
+    def get_version(self, timeout: float = None):
+        """获取设备版本信息 (缓存)。"""
+        return self._get('version', timeout)
+
+    def get_config(self, timeout: float = None):
+        """获取设备配置 (缓存)。"""
+        return self._get('config', timeout)
+
+    def get_spectrum(self, timeout: float = None):
+        """获取频谱数据，不缓存。"""
+        return self._client.get_spectrum(timeout=timeout)
+
+    def set_config(self, config_data: dict):
+        """设置设备配置，并使 config / status 缓存失效。"""
+        try:
+            return self._client.set_config(config_data)
+        finally:
+            self.invalidate('config', 'status')
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+def get_cache_stats() -> dict:
+    """各节点缓存的命中计数。"""
+    with _registry_lock:
+        return {base_url: dict(cached.stats) for base_url, cached in _registry.items()}
+
+def get_cached_meshapi(base_url: str) -> CachedMeshAPI:
+    """获取 base_url 对应的共享 CachedMeshAPI，底层复用 get_meshapi() 的连接池。"""
+    key = base_url.rstrip('/')
+    cached = _registry.get(key)
+    if cached is not None:
+        return cached
+
+    with _registry_lock:
+        cached = _registry.get(key)
+        if cached is None:
+            cached = CachedMeshAPI(get_meshapi(key))
+            _registry[key] = cached
+        return cached
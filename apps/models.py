@@ -64,7 +64,8 @@ class Group(db.Model):
     name = db.Column(db.String, unique=True, nullable=False)
     # 定义与 User 表的关系：一个 Group 可以有多个 User
     # backref='group' 会在 User 模型中自动创建一个 'group' 属性，指向所属的 Group 对象
-    users = relationship("DevUser", backref="group", lazy="joined")
+    # lazy="dynamic"：group.users 返回查询对象，成员按需分页读取，加载 Group 时不再 JOIN 全部成员
+    users = relationship("DevUser", backref="group", lazy="dynamic")
 
     def __repr__(self):
         return f"<Group(id={self.id}, name='{self.name}')>"
@@ -85,9 +86,194 @@ class DevUser(db.Model):
     # nullable=True 必须设置为 True，因为 group_id 现在可以为 NULL
     group_id = db.Column(db.Integer, db.ForeignKey('groups.id', ondelete="SET NULL"), nullable=True)
 
+    # 由 mesh nodeInfos 同步 (apps.registry)，手工登记且从未被发现的设备为空
+    first_seen = db.Column(db.DateTime, nullable=True)
+    last_seen = db.Column(db.DateTime, nullable=True)
+
     def __repr__(self):
         return f"<User(id={self.id}, username='{self.username}', ip_address='{self.ip_address}', group_id={self.group_id})>"
     
+class DeviceTelemetry(db.Model):
+    """
+    设备遥测记录，由 collect_telemetry 周期任务批量写入，每个节点每次轮询一行。
+    """
+    __tablename__ = 'device_telemetry'
+
+    id = db.Column(db.Integer, primary_key=True)
+    ts = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    base_url = db.Column(db.String(128), nullable=False)
+
+    self_id = db.Column(db.Integer, nullable=True)
+    battery = db.Column(db.Float, nullable=True)
+    temp = db.Column(db.Float, nullable=True)
+    operating_freq = db.Column(db.Integer, nullable=True)
+    node_number = db.Column(db.Integer, nullable=True)
+    # nodeInfos 以紧凑 JSON 文本保存
+    node_infos = db.Column(db.Text, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_device_telemetry_base_url_ts', 'base_url', 'ts'),
+    )
+
+    def __repr__(self):
+        return f"<DeviceTelemetry(id={self.id}, base_url='{self.base_url}', ts={self.ts})>"
+
+class TelemetryRollup(db.Model):
+    """
+    遥测按时间桶聚合的结果 (1m / 1h / 1d)，保存 count/min/max/sum 以便增量合并，平均值由 sum/count 得出。
+    """
+    __tablename__ = 'telemetry_rollups'
+
+    id = db.Column(db.Integer, primary_key=True)
+    resolution = db.Column(db.String(8), nullable=False)
+    bucket = db.Column(db.DateTime, nullable=False)
+    base_url = db.Column(db.String(128), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    battery_min = db.Column(db.Float, nullable=True)
+    battery_max = db.Column(db.Float, nullable=True)
+    battery_sum = db.Column(db.Float, nullable=True)
+    battery_count = db.Column(db.Integer, nullable=False, default=0)
+    temp_min = db.Column(db.Float, nullable=True)
+    temp_max = db.Column(db.Float, nullable=True)
+    temp_sum = db.Column(db.Float, nullable=True)
+    temp_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('resolution', 'base_url', 'bucket', name='uq_telemetry_rollups_bucket'),
+    )
+
+    def __repr__(self):
+        return f"<TelemetryRollup(resolution='{self.resolution}', base_url='{self.base_url}', bucket={self.bucket})>"
+
+class RollupWatermark(db.Model):
+    """
+    增量任务的处理进度：已处理到的最大源表 id。
+    """
+    __tablename__ = 'rollup_watermarks'
+
+    name = db.Column(db.String(64), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    update_time = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<RollupWatermark(name='{self.name}', last_id={self.last_id})>"
+
+class InterferenceEvent(db.Model):
+    """
+    频谱干扰事件，由 detect_interference 任务写入。
+    kind: new_interferer (新出现的干扰) / operating_channel (干扰落在工作信道内)
+    """
+    __tablename__ = 'interference_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    ts = db.Column(db.DateTime, nullable=False)
+    base_url = db.Column(db.String(128), nullable=False)
+    kind = db.Column(db.String(32), nullable=False)
+    freq = db.Column(db.Float, nullable=False)
+    level = db.Column(db.Float, nullable=True)
+    excess = db.Column(db.Float, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_interference_events_base_url_ts', 'base_url', 'ts'),
+    )
+
+    def __repr__(self):
+        return f"<InterferenceEvent(base_url='{self.base_url}', kind='{self.kind}', freq={self.freq})>"
+
+class StatusHistory(db.Model):
+    """
+    设备 status 历史 (apps.history)：keyframe 为 True 的行是完整状态，其余行只保存与上一条相比的差异。
+    """
+    __tablename__ = 'status_history'
+
+    id = db.Column(db.Integer, primary_key=True)
+    base_url = db.Column(db.String(128), nullable=False)
+    ts = db.Column(db.DateTime, nullable=False)
+    keyframe = db.Column(db.Boolean, nullable=False, default=False)
+    data = db.Column(db.Text, nullable=False)     # JSON
+
+    __table_args__ = (
+        db.Index('ix_status_history_base_url_ts', 'base_url', 'ts'),
+        db.Index('ix_status_history_base_url_keyframe_ts', 'base_url', 'keyframe', 'ts'),
+    )
+
+    def __repr__(self):
+        return f"<StatusHistory(base_url='{self.base_url}', ts={self.ts}, keyframe={self.keyframe})>"
+
+class AlertRule(db.Model):
+    """
+    告警规则，由 apps.alerts 编译为求值器，对每个遥测样本增量求值。
+    kind: threshold (status 字段与阈值比较) / rate (字段每分钟变化量与阈值比较) / dropout (节点从 nodeInfos 中消失)
+    clear 为解除告警的电平 (迟滞)，为空时等于 threshold；for_samples 为连续满足条件多少个样本才触发。
+    """
+    __tablename__ = 'alert_rules'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    kind = db.Column(db.String(16), nullable=False)
+    field = db.Column(db.String(64), nullable=True)
+    op = db.Column(db.String(2), nullable=True)
+    threshold = db.Column(db.Float, nullable=True)
+    clear = db.Column(db.Float, nullable=True)
+    window = db.Column(db.Float, nullable=True)          # rate: 计算变化率的时间窗口 (秒)
+    for_samples = db.Column(db.Integer, nullable=False, default=1)
+    severity = db.Column(db.String(16), nullable=False, default='warning')
+    base_url = db.Column(db.String(128), nullable=True)  # 为空时适用于所有节点
+    enabled = db.Column(db.Boolean, nullable=False, default=True)
+    updated = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<AlertRule(id={self.id}, name='{self.name}', kind='{self.kind}')>"
+
+class Alert(db.Model):
+    """
+    告警记录。同一规则、节点、对象 (subject，dropout 时为消失的节点 id) 同时只有一条未解除 (cleared 为空) 的告警。
+    """
+    __tablename__ = 'alerts'
+
+    id = db.Column(db.Integer, primary_key=True)
+    rule_id = db.Column(db.Integer, db.ForeignKey('alert_rules.id', ondelete="CASCADE"), nullable=False)
+    base_url = db.Column(db.String(128), nullable=False)
+    subject = db.Column(db.String(64), nullable=False, default='')
+    severity = db.Column(db.String(16), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    value = db.Column(db.Float, nullable=True)
+    started = db.Column(db.DateTime, nullable=False)
+    cleared = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_alerts_rule_id_base_url_subject', 'rule_id', 'base_url', 'subject'),
+        db.Index('ix_alerts_started', 'started'),
+    )
+
+    def __repr__(self):
+        return f"<Alert(rule_id={self.rule_id}, base_url='{self.base_url}', subject='{self.subject}')>"
+
+class PendingConfig(db.Model):
+    """
+    待下发的配置项 (write-behind 队列)。同一节点同一配置键只保留最新的值，
+    节点下一次轮询成功后由 apps.configqueue 合并为一次 set_config 下发，成功后删除。
+    """
+    __tablename__ = 'pending_config'
+
+    id = db.Column(db.Integer, primary_key=True)
+    base_url = db.Column(db.String(128), nullable=False)
+    key = db.Column(db.String(64), nullable=False)
+    value = db.Column(db.Text, nullable=False)   # JSON 编码
+    created = db.Column(db.DateTime, nullable=False)
+    updated = db.Column(db.DateTime, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    version = db.Column(db.Integer, nullable=False, default=0)   # 每次覆盖加一，下发结果按它匹配
+
+    __table_args__ = (
+        db.UniqueConstraint('base_url', 'key', name='uq_pending_config_base_url_key'),
+    )
+
+    def __repr__(self):
+        return f"<PendingConfig(base_url='{self.base_url}', key='{self.key}', attempts={self.attempts})>"
+
 class Company(db.Model):
     __tablename__ = 'companies'
 
@@ -0,0 +1,91 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from apps import db
+from apps.config import Config
+from apps.models import DevUser
+from apps.exceptions.exception import InvalidUsage
+
+# IN 子句每批的 id 数量，避免超出数据库的参数个数上限
+_CHUNK = 500
+
+def _chunks(items: list, size: int = _CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def sync_registry(node_infos: list, now: datetime = None, granularity: float = None) -> dict:
+    """
+    将 mesh 上报的 nodeInfos 同步到 devusers 表 (按 devidce_id 对应节点 id)。
+      - 新节点：一条 executemany INSERT，用户名 node-<id>，first_seen = last_seen = now；
+      - last_seen 早于 granularity 秒之前：一条按主键的批量 UPDATE，只更新 last_seen
+        (人工登记、之后才被发现的行 first_seen 为空，同时补上 first_seen)；
+      - 其余行不做任何写入。
+    每轮的语句数为 读取 (每 500 个节点一条) + 至多一条 INSERT + 至多一条 UPDATE。
+    ip_address 只在新建时取自 nodeInfos：已有行的地址是轮询实际使用的管理地址 (可能是带端口的 URL)，
+    由人工维护，与 mesh 内上报的 IP 不一定相同，同步不修改；所属组 (group_id) 同样不修改。
+    需要在 Flask 应用上下文中调用。
+    Args:
+        node_infos (list): nodeInfos 字典列表 (至少包含 id 和 ip)。
+        now (datetime, optional): 本轮时间 (UTC)。
+        granularity (float, optional): last_seen 的更新粒度 (秒)，默认 Config.REGISTRY_SEEN_GRANULARITY。
+    Returns:
+        dict: seen / inserted / updated / unchanged 计数。
+    """
+    now = now or datetime.utcnow()
+    granularity = timedelta(seconds=Config.REGISTRY_SEEN_GRANULARITY if granularity is None else granularity)
+
+    discovered = {}
+    for info in node_infos:
+        if isinstance(info.get('id'), int) and info.get('ip'):
+            discovered.setdefault(info['id'], info['ip'])
+
+    try:
+        existing = {}
+        for ids in _chunks(list(discovered)):
+            rows = db.session.execute(
+                select(DevUser.id, DevUser.devidce_id, DevUser.first_seen, DevUser.last_seen)
+                .where(DevUser.devidce_id.in_(ids)))
+            existing.update({row.devidce_id: row for row in rows})
+
+        updates = []
+        for node_id, row in existing.items():
+            if row.first_seen is None:
+                updates.append({'id': row.id, 'first_seen': now, 'last_seen': now})
+            elif row.last_seen is None or now - row.last_seen >= granularity:
+                updates.append({'id': row.id, 'last_seen': now})
+
+        new_ids = [node_id for node_id in discovered if node_id not in existing]
+        inserts = []
+        if new_ids:
+            # 手工登记的设备可能已占用 node-<id> 这样的用户名
+            names = {node_id: f"node-{node_id}" for node_id in new_ids}
+            taken = set()
+            for chunk in _chunks(list(names.values())):
+                taken.update(db.session.execute(select(DevUser.username).where(DevUser.username.in_(chunk))).scalars())
+            inserts = [{'username': name if name not in taken else f"{name}-{now:%Y%m%d%H%M%S}",
+                        'ip_address': discovered[node_id], 'devidce_id': node_id,
+                        'first_seen': now, 'last_seen': now}
+                       for node_id, name in names.items()]
+            db.session.execute(insert(DevUser), inserts)
+        if updates:
+            db.session.execute(update(DevUser), updates)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        db.session.close()
+        error = str(e.__dict__.get('orig', e))
+        raise InvalidUsage(error, 422)
+
+    return {
+        'seen': len(discovered),
+        'inserted': len(inserts),
+        'updated': len(updates),
+        'unchanged': len(existing) - len(updates),
+    }
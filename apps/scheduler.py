@@ -0,0 +1,266 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+
+自适应轮询调度器：常驻进程，按每个节点自己的间隔轮询 /status 并批量写入遥测。
+
+    python -m apps.scheduler
+
+运行调度器时设置 TELEMETRY_ADAPTIVE=True，beat 中固定间隔的 collect_telemetry 将不再注册。
+"""
+
+import os
+import time
+import heapq
+import queue
+import random
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from apps.config import Config
+from apps.meshapi import get_meshapi
+
+logger = logging.getLogger(__name__)
+
+class NodeSchedule:
+    """单个节点的调度状态。"""
+    __slots__ = ('base_url', 'interval', 'due', 'status', 'errors', 'polls', 'changes')
+
+    def __init__(self, base_url: str, interval: float, due: float):
+        self.base_url = base_url
+        self.interval = interval
+        self.due = due
+        self.status = None
+        self.errors = 0
+        self.polls = 0
+        self.changes = 0
+
+    def to_dict(self):
+        return {
+            'base_url': self.base_url,
+            'interval': round(self.interval, 1),
+            'due_in': round(self.due - time.monotonic(), 1),
+            'errors': self.errors,
+            'polls': self.polls,
+            'changes': self.changes,
+        }
+
+def status_changed(old: dict, new: dict, thresholds: dict = None) -> bool:
+    """
+    判断两次 status 之间是否有值得关注的变化：
+    数值字段变化超过 thresholds 中的阈值，或工作频点 / 节点数 / 静默状态改变。
+    """
+    thresholds = thresholds or Config.SCHEDULER_CHANGE_THRESHOLDS
+    if old is None:
+        return False
+    for field, threshold in thresholds.items():
+        before, after = old.get(field), new.get(field)
+        if isinstance(before, (int, float)) and isinstance(after, (int, float)):
+            if abs(after - before) >= threshold:
+                return True
+        elif before != after:
+            return True
+    return any(old.get(field) != new.get(field) for field in ('operatingFreq', 'nodeNumber', 'silenced'))
+
+class AdaptiveScheduler:
+    """
+    每个节点一个轮询间隔，限制在 [min_interval, max_interval]，按以下规则调整：
+      - status 有变化：间隔减半 (变化越频繁采样越密)；
+      - 没有变化：间隔乘以 backoff (稳定节点逐渐放慢)；
+      - 请求失败：按连续失败次数指数退避 (熔断器打开时请求本身也会快速失败)；
+      - 电量低于 low_battery：间隔不超过 low_battery_interval，电量耗尽前保持关注。
+    下次轮询时间加入 ±jitter 比例的随机抖动，新节点的首次轮询在 min_interval 内随机分布，
+    避免同时到期造成突发。到期的节点由最小堆取出，在有界线程池中并发执行。
+    """
+
+    def __init__(self, min_interval: float = None, max_interval: float = None, max_workers: int = None,
+                 backoff: float = None, jitter: float = None, low_battery: float = None,
+                 low_battery_interval: float = None, poll=None, on_result=None):
+        self.min_interval = min_interval or Config.SCHEDULER_MIN_INTERVAL
+        self.max_interval = max_interval or Config.SCHEDULER_MAX_INTERVAL
+        self.backoff = backoff or Config.SCHEDULER_BACKOFF
+        self.jitter = Config.SCHEDULER_JITTER if jitter is None else jitter
+        self.low_battery = Config.SCHEDULER_LOW_BATTERY if low_battery is None else low_battery
+        self.low_battery_interval = low_battery_interval or Config.SCHEDULER_LOW_BATTERY_INTERVAL
+        self.poll = poll or (lambda base_url: get_meshapi(base_url).get_status(timeout=Config.FLEET_NODE_TIMEOUT))
+        self.on_result = on_result
+
+        self.nodes = {}
+        self._heap = []
+        self._results = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or Config.FLEET_MAX_WORKERS,
+                                            thread_name_prefix='scheduler')
+        self._in_flight = set()
+        self._stop = threading.Event()
+        self.rng = random.Random()
+
+    def set_nodes(self, base_urls: list):
+        """更新要轮询的节点集合，新节点在 min_interval 内随机安排首次轮询，移除的节点不再调度。"""
+        now = time.monotonic()
+        wanted = set(base_urls)
+        for base_url in wanted - self.nodes.keys():
+            node = self.nodes[base_url] = NodeSchedule(base_url, self.min_interval,
+                                                       now + self.rng.uniform(0, self.min_interval))
+            heapq.heappush(self._heap, (node.due, base_url))
+        for base_url in self.nodes.keys() - wanted:
+            del self.nodes[base_url]
+
+    def _next_interval(self, node: NodeSchedule, status: dict, error: Exception, changed: bool) -> float:
+        if error is not None:
+            # 每次连续失败在当前间隔上翻倍 (node.interval 已包含之前的退避)，由 max_interval 封顶
+            interval = node.interval * 2
+        elif changed:
+            interval = node.interval / 2
+        else:
+            interval = node.interval * self.backoff
+        interval = min(self.max_interval, max(self.min_interval, interval))
+
+        battery = (status or node.status or {}).get('batteryLevel')
+        if isinstance(battery, (int, float)) and battery < self.low_battery:
+            interval = min(interval, self.low_battery_interval)
+        return interval
+
+    def _complete(self, base_url: str, status: dict, error: Exception, ts: float):
+        node = self.nodes.get(base_url)
+        self._in_flight.discard(base_url)
+        if node is None:
+            return
+        node.polls += 1
+        changed = error is None and status_changed(node.status, status)
+        node.changes += changed
+        node.interval = self._next_interval(node, status, error, changed)
+        if error is None:
+            node.errors = 0
+            node.status = status
+        else:
+            node.errors += 1
+        node.due = time.monotonic() + node.interval * self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+        heapq.heappush(self._heap, (node.due, base_url))
+        if self.on_result:
+            self.on_result(base_url, status, error, ts)
+
+    def _run_poll(self, base_url: str):
+        ts = time.time()
+        try:
+            self._results.put((base_url, self.poll(base_url), None, ts))
+        except Exception as e:
+            self._results.put((base_url, None, e, ts))
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self._heap and self._heap[0][0] <= now:
+            due, base_url = heapq.heappop(self._heap)
+            node = self.nodes.get(base_url)
+            # 堆中可能残留已移除节点或被重新安排过的旧条目
+            if node is None or node.due != due or base_url in self._in_flight:
+                continue
+            self._in_flight.add(base_url)
+            self._executor.submit(self._run_poll, base_url)
+
+    def run_once(self, timeout: float):
+        """派发所有到期的轮询，并处理 timeout 秒内返回的结果。"""
+        self._dispatch()
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = deadline - time.monotonic()
+            if self._heap:
+                wait = min(wait, self._heap[0][0] - time.monotonic())
+            try:
+                self._complete(*self._results.get(timeout=max(0.0, wait)))
+            except queue.Empty:
+                return
+            if time.monotonic() >= deadline:
+                return
+
+    def run(self, tick=None, tick_interval: float = 10.0):
+        """主循环，直到 stop()。tick 每 tick_interval 秒调用一次 (刷新节点列表、写入结果等)。"""
+        next_tick = 0.0
+        while not self._stop.is_set():
+            if tick and time.monotonic() >= next_tick:
+                tick()
+                next_tick = time.monotonic() + tick_interval
+            self.run_once(min(1.0, max(0.0, next_tick - time.monotonic())))
+
+    def stop(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        intervals = sorted(node.interval for node in self.nodes.values())
+        return {
+            'nodes': len(intervals),
+            'in_flight': len(self._in_flight),
+            'failing': sum(1 for node in self.nodes.values() if node.errors),
+            'interval_min': intervals[0] if intervals else None,
+            'interval_median': intervals[len(intervals) // 2] if intervals else None,
+            'interval_max': intervals[-1] if intervals else None,
+            'polls_per_minute': round(sum(60.0 / i for i in intervals), 1),
+        }
+
+def main():
+    from apps import create_app
+    from apps.config import config_dict
+    from apps.fleet import registered_base_urls
+    from apps.telemetry import status_to_row, store_samples
+    from apps.registry import sync_registry
+    from apps.configqueue import deliver_pending
+    from apps.history import get_history_writer
+    from apps.alerts import get_alert_engine
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    app = create_app(config_dict['Debug' if os.getenv('DEBUG', 'False') == 'True' else 'Production'])
+
+    pending, history, node_infos, reachable = [], [], {}, set()
+    lock = threading.Lock()
+
+    def on_result(base_url, status, error, ts):
+        if error is None:
+            with lock:
+                pending.append(status_to_row(base_url, status, datetime.utcfromtimestamp(ts)))
+                history.append((base_url, datetime.utcfromtimestamp(ts), status))
+                reachable.add(base_url)
+                for info in status.get('nodeInfos') or []:
+                    node_infos.setdefault(info.get('id'), info)
+
+    scheduler = AdaptiveScheduler(on_result=on_result)
+    last_refresh = [0.0]
+
+    def tick():
+        with lock:
+            rows, samples, infos, urls = pending[:], history[:], list(node_infos.values()), list(reachable)
+            pending.clear()
+            history.clear()
+            node_infos.clear()
+            reachable.clear()
+        with app.app_context():
+            try:
+                stored = store_samples(rows)
+                get_history_writer().store(samples)
+                # 与 collect_telemetry 一样用轮询到的 nodeInfos 同步设备登记表
+                sync_registry(infos)
+            except Exception as e:
+                logger.warning(f"写入遥测失败: {e}")
+                stored = 0
+            try:
+                get_alert_engine().process(samples)
+            except Exception as e:
+                logger.warning(f"告警求值失败: {e}")
+            try:
+                deliver_pending(urls)
+            except Exception as e:
+                logger.warning(f"下发排队配置失败: {e}")
+            if time.monotonic() - last_refresh[0] >= Config.SCHEDULER_REFRESH:
+                scheduler.set_nodes(registered_base_urls())
+                last_refresh[0] = time.monotonic()
+        logger.info(f"scheduler: stored={stored} {scheduler.stats()}")
+
+    try:
+        scheduler.run(tick, Config.SCHEDULER_FLUSH)
+    except KeyboardInterrupt:
+        scheduler.stop()
+        tick()
+
+if __name__ == "__main__":
+    main()
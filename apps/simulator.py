@@ -0,0 +1,277 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+
+MimoMesh 设备模拟器：一个进程模拟任意数量的节点，用于在没有电台的环境下压测设备页面和全网功能。
+每个节点的地址为 http://<host>:<port>/node/<i>，提供 /status /version /spectrum /config (GET / POST)；
+不带 /node/<i> 前缀的请求由 0 号节点处理，因此也可以直接把 MIMOMESH_BASE_URL 指向模拟器。
+
+    python -m apps.simulator --nodes 200 --mesh-size 20 --latency 0.05 --jitter 0.02 --failure-rate 0.01
+    python -m apps.simulator --nodes 200 --register     # 同时把节点登记到 DevUser 表
+"""
+
+import json
+import math
+import time
+import random
+import argparse
+import threading
+import numpy as np
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from apps.interference import operating_band
+
+FREQ_LIST = [float(f) for f in np.arange(1420e6, 1520e6, 5e6)]
+
+class SimulatedNode:
+    """
+    一个模拟节点的状态。电量缓慢下降、温度随机游走；
+    频谱为噪声底 + 工作信道上的信号，偶尔出现一个窄带干扰。
+    """
+
+    def __init__(self, index: int, mesh: list, bins: int, seed: int = 0):
+        self.index = index
+        self.mesh = mesh            # 同一 mesh 内所有节点 (含自身)
+        self.bins = bins
+        self.rng = random.Random(seed * 100003 + index)
+        self.id = index + 1
+        self.ip = f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256 + 1}"
+        self.position = (round(39.9 + self.rng.uniform(-0.05, 0.05), 6),
+                         round(116.4 + self.rng.uniform(-0.05, 0.05), 6),
+                         round(self.rng.uniform(20, 300), 1))
+        self.battery = self.rng.uniform(60, 100)
+        self.temp = self.rng.uniform(30, 50)
+        self.config = {
+            'name': f"node-{self.id}",
+            'span': 3,
+            'freqList': FREQ_LIST[:8],
+            'power': 20,
+            'silenced': False,
+        }
+        self.operating_freq = self.rng.randrange(len(self.config['freqList']))
+        self.links = None
+        self.lock = threading.Lock()
+
+    def tick(self):
+        with self.lock:
+            self.battery = max(0.0, self.battery - self.rng.uniform(0, 0.01))
+            self.temp = min(90.0, max(-20.0, self.temp + self.rng.gauss(0, 0.2)))
+
+    def link_quality(self, other: "SimulatedNode") -> dict:
+        # 链路质量由两节点的距离决定，与请求方向无关
+        distance = math.hypot(self.position[0] - other.position[0], self.position[1] - other.position[1]) * 111e3
+        snr = round(35 - 20 * math.log10(max(distance, 1.0) / 100), 1)
+        return {'id': other.id, 'snr': snr, 'rssi': round(snr - 95, 1)}
+
+    def node_info(self) -> dict:
+        latitude, longitude, altitude = self.position
+        # 节点位置固定，链路质量只算一次
+        if self.links is None:
+            links = [self.link_quality(other) for other in self.mesh if other is not self]
+            self.links = [link for link in links if link['snr'] > 0]
+        return {
+            'id': self.id,
+            'ip': self.ip,
+            'latitude': latitude,
+            'longitude': longitude,
+            'altitude': altitude,
+            'resourceRatio': round(self.rng.uniform(0.05, 0.9), 3),
+            'links': self.links,
+        }
+
+    def status(self) -> dict:
+        self.tick()
+        return {
+            'name': self.config['name'],
+            'ip': self.ip,
+            'selfId': self.id,
+            'nodeNumber': len(self.mesh),
+            'batteryLevel': round(self.battery, 2),
+            'temp': round(self.temp, 2),
+            'silenced': self.config['silenced'],
+            'operatingFreq': self.operating_freq,
+            'nodeInfos': [node.node_info() for node in self.mesh],
+        }
+
+    def version(self) -> dict:
+        return {'firmware': '2.4.1-sim', 'hardware': 'MM-2x2', 'build': '20250101'}
+
+    def spectrum(self) -> dict:
+        with self.lock:
+            low, high = operating_band({'operatingFreq': self.operating_freq}, self.config) or (1420e6, 1440e6)
+        center, width = (low + high) / 2, high - low
+        step = 4 * width / self.bins
+        start = center - 2 * width
+        rng = np.random.default_rng(self.rng.getrandbits(32))
+        samples = rng.normal(-100, 2, self.bins)
+        freqs = start + np.arange(self.bins) * step
+        samples[np.abs(freqs - center) <= width / 2] += 35
+        if self.rng.random() < 0.05:
+            samples[rng.integers(self.bins)] += 30
+        return {'startFreq': start, 'step': step, 'spectrum': np.round(samples, 1).tolist()}
+
+    def set_config(self, changes: dict) -> dict:
+        with self.lock:
+            self.config.update(changes)
+        return {'result': 'ok'}
+
+class Simulator:
+    """
+    在一个线程化 HTTP 服务器中模拟 nodes 个节点，每 mesh_size 个节点组成一个 mesh。
+    latency / jitter (秒) 为每个响应的延迟均值和均匀抖动；failure_rate 比例的请求返回 503；
+    offline 比例的节点 (编号最大的那些) 接受连接后不响应，用于测试超时与熔断。
+    """
+
+    def __init__(self, nodes: int = 100, mesh_size: int = 20, bins: int = 1024, latency: float = 0.0,
+                 jitter: float = 0.0, failure_rate: float = 0.0, offline: float = 0.0,
+                 host: str = '127.0.0.1', port: int = 0, seed: int = 0):
+        self.latency, self.jitter, self.failure_rate = latency, jitter, failure_rate
+        self.nodes = []
+        for first in range(0, nodes, mesh_size):
+            mesh = []
+            for index in range(first, min(first + mesh_size, nodes)):
+                mesh.append(SimulatedNode(index, mesh, bins, seed))
+            self.nodes.extend(mesh)
+        self.offline = set(range(nodes - int(nodes * offline), nodes))
+        self.rng = random.Random(seed)
+        self.stats = {'requests': 0, 'failed': 0}
+
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _route(self):
+                parts = self.path.split('?')[0].strip('/').split('/')
+                if len(parts) == 3 and parts[0] == 'node' and parts[1].isdigit() and int(parts[1]) < len(simulator.nodes):
+                    return int(parts[1]), parts[2]
+                if len(parts) == 1:
+                    return 0, parts[0]
+                return None, None
+
+            def _reply(self, code: int, payload: dict):
+                body = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self, method: str):
+                index, endpoint = self._route()
+                simulator.stats['requests'] += 1
+                if index in simulator.offline:
+                    # 不响应也不关闭连接，客户端只能等到超时
+                    time.sleep(3600)
+                    return
+                delay = simulator.latency + simulator.rng.uniform(-simulator.jitter, simulator.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+                if index is None or endpoint not in ('status', 'version', 'spectrum', 'config'):
+                    return self._reply(404, {'error': 'not found'})
+                if simulator.rng.random() < simulator.failure_rate:
+                    simulator.stats['failed'] += 1
+                    return self._reply(503, {'error': 'simulated failure'})
+
+                node = simulator.nodes[index]
+                if method == 'POST':
+                    if endpoint != 'config':
+                        return self._reply(405, {'error': 'method not allowed'})
+                    length = int(self.headers.get('Content-Length') or 0)
+                    return self._reply(200, node.set_config(json.loads(self.rfile.read(length) or b'{}')))
+                if endpoint == 'config':
+                    with node.lock:
+                        return self._reply(200, dict(node.config))
+                return self._reply(200, getattr(node, endpoint)())
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 1024
+
+        Handler.disable_nagle_algorithm = True
+        self.server = Server((host, port), Handler)
+        self._thread = None
+
+    @property
+    def address(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_urls(self) -> list:
+        return [f"{self.address}/node/{node.index}" for node in self.nodes]
+
+    def start(self) -> "Simulator":
+        """在后台线程中启动服务器。"""
+        self._thread = threading.Thread(target=self.server.serve_forever, name='simulator', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
+
+def register_nodes(base_urls: list):
+    """把模拟节点登记到 DevUser 表 (用户名 sim-<i>)，已存在的跳过。"""
+    import os
+    from apps import create_app, db
+    from apps.config import config_dict
+    from apps.models import DevUser
+
+    app = create_app(config_dict['Debug' if os.getenv('DEBUG', 'False') == 'True' else 'Production'])
+    with app.app_context():
+        existing = {ip for (ip,) in DevUser.query.with_entities(DevUser.ip_address)}
+        next_id = (db.session.query(db.func.max(DevUser.devidce_id)).scalar() or 0) + 1
+        added = 0
+        for base_url in base_urls:
+            if base_url in existing:
+                continue
+            db.session.add(DevUser(username=f"sim-{next_id}", ip_address=base_url, devidce_id=next_id))
+            next_id += 1
+            added += 1
+        db.session.commit()
+    print(f"已登记 {added} 个模拟节点")
+
+def main():
+    parser = argparse.ArgumentParser(description="MimoMesh 设备模拟器")
+    parser.add_argument('--nodes', type=int, default=100, help="节点数量")
+    parser.add_argument('--mesh-size', type=int, default=20, help="每个 mesh 的节点数 (nodeInfos 长度)")
+    parser.add_argument('--bins', type=int, default=1024, help="频谱频点数")
+    parser.add_argument('--latency', type=float, default=0.0, help="响应延迟 (秒)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="延迟抖动 (秒，均匀分布)")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="返回 503 的请求比例")
+    parser.add_argument('--offline', type=float, default=0.0, help="不响应的节点比例")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--register', action='store_true', help="把节点登记到 DevUser 表")
+    args = parser.parse_args()
+
+    simulator = Simulator(args.nodes, args.mesh_size, args.bins, args.latency, args.jitter,
+                          args.failure_rate, args.offline, args.host, args.port, args.seed)
+    if args.register:
+        register_nodes(simulator.base_urls)
+    print(f"模拟 {len(simulator.nodes)} 个节点: {simulator.base_urls[0]} ... {simulator.base_urls[-1]}")
+    try:
+        simulator.server.serve_forever()
+    except KeyboardInterrupt:
+        simulator.server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+"""
+
+import threading
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class WaitTimeout(TimeoutError):
+    """等待其他调用者发起的同一调用超时。"""
+
+class SingleFlight:
+    """
+    请求合并 (single-flight)：同一个 key 同时只有一个调用真正执行，
+    其余并发调用等待并共享它的结果或异常。线程安全。
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.stats = {'issued': 0, 'coalesced': 0}
+
+    def do(self, key, fn, *args, timeout: float = None, **kwargs):
+        """
+        执行 fn(*args, **kwargs)，若相同 key 的调用正在进行则等待其结果。
+        Args:
+            key: 可哈希的调用标识，例如 (base_url, endpoint)。
+            fn (callable): 实际执行的函数。
+            timeout (float, optional): 等待别人发起的调用最多多少秒，默认一直等待；
+                领头的调用者可能使用更长的超时，等待者不应因此超出自己的期限。
+        Returns:
+            fn 的返回值 (所有等待者共享同一个对象)。
+        Raises:
+            WaitTimeout: 等待超过 timeout (调用本身仍在继续，结果交给其他等待者)。
+            fn 抛出的异常，同样传递给所有等待者。
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.stats['coalesced'] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.stats['issued'] += 1
+                leader = True
+
+        if not leader:
+            if not call.event.wait(timeout):
+                raise WaitTimeout(f"等待进行中的调用超过 {timeout} 秒")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def in_flight(self) -> int:
+        """当前正在进行的调用数量。"""
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,81 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+"""
+
+import struct
+import numpy as np
+
+from apps.decimate import decimate
+
+# 二进制频谱帧头：magic, 版本, 标志位, 采样点数, 起始频率 (Hz), 频率步进 (Hz)
+# 小端，共 28 字节 (4 的倍数)，浏览器可直接 new Float32Array(buffer, 28) 读取后续采样
+# 设置 SPECTRUM_FLAG_INDEXED 时 (抽稀后的帧)，采样之后紧跟同样数量的 uint32 频点下标，
+# 第 i 个采样的频率为 start + index[i] * step
+SPECTRUM_MAGIC   = b'MSPC'
+SPECTRUM_VERSION = 1
+SPECTRUM_HEADER  = struct.Struct('<4sHHIdd')
+SPECTRUM_MIMETYPE = 'application/octet-stream'
+SPECTRUM_FLAG_INDEXED = 0x1
+
+def parse_spectrum(payload) -> tuple:
+    """
+    解析 MeshAPI.get_spectrum() 的响应。
+    兼容直接返回采样列表，或包含 spectrum/data/samples 以及 startFreq/step (或 stopFreq) 的字典。
+    Args:
+        payload (list | dict): /spectrum 响应数据。
+    Returns:
+        tuple: (np.ndarray[float32] 采样, 起始频率, 频率步进)
+    Raises:
+        ValueError: 响应中找不到采样数据。
+    """
+    if isinstance(payload, dict):
+        samples = next((payload[key] for key in ('spectrum', 'data', 'samples') if key in payload), None)
+        start = float(payload.get('startFreq', payload.get('freqStart', 0)))
+        step = payload.get('step', payload.get('freqStep'))
+    else:
+        samples, start, step = payload, 0.0, None
+
+    if samples is None:
+        raise ValueError("频谱响应中没有采样数据")
+
+    samples = np.asarray(samples, dtype=np.float32).ravel()
+    if step is None:
+        stop = payload.get('stopFreq') if isinstance(payload, dict) else None
+        step = (float(stop) - start) / (samples.size - 1) if stop is not None and samples.size > 1 else 1.0
+    return samples, start, float(step)
+
+def encode_spectrum(samples: np.ndarray, start: float, step: float, index: np.ndarray = None) -> bytes:
+    """
+    将 float32 采样编码为 帧头 + 原始小端 float32 字节。
+    Args:
+        index (np.ndarray, optional): 抽稀后每个采样对应的原始频点下标。
+    """
+    samples = np.ascontiguousarray(samples, dtype='<f4')
+    flags = 0 if index is None else SPECTRUM_FLAG_INDEXED
+    header = SPECTRUM_HEADER.pack(SPECTRUM_MAGIC, SPECTRUM_VERSION, flags, samples.size, start, step)
+    if index is None:
+        return header + samples.tobytes()
+    return header + samples.tobytes() + np.ascontiguousarray(index, dtype='<u4').tobytes()
+
+def decode_spectrum(buffer: bytes) -> tuple:
+    """encode_spectrum 的逆操作，返回 (采样, 起始频率, 频率步进, 频点下标或 None)。"""
+    magic, version, flags, count, start, step = SPECTRUM_HEADER.unpack_from(buffer)
+    if magic != SPECTRUM_MAGIC or version != SPECTRUM_VERSION:
+        raise ValueError("不是有效的频谱帧")
+    samples = np.frombuffer(buffer, dtype='<f4', count=count, offset=SPECTRUM_HEADER.size)
+    index = None
+    if flags & SPECTRUM_FLAG_INDEXED:
+        index = np.frombuffer(buffer, dtype='<u4', count=count, offset=SPECTRUM_HEADER.size + 4 * count)
+    return samples, start, step, index
+
+def decimate_spectrum(samples: np.ndarray, points: int, mode: str = 'minmax') -> tuple:
+    """
+    将频谱抽稀到不超过 points 个点，默认使用保留峰值的 minmax 模式。
+    Returns:
+        tuple: (抽稀后的采样, 频点下标)；不需要抽稀时下标为 None。
+    """
+    if not points or samples.size <= points:
+        return samples, None
+    index = decimate(samples, points, mode)
+    return samples[index], index
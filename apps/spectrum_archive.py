@@ -0,0 +1,183 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+"""
+
+import os
+import re
+import json
+import time
+import numpy as np
+
+from apps.config import Config
+
+class SpectrumArchive:
+    """
+    单个节点的只追加频谱归档。
+    数据按段 (segment) 存放，每段三个文件：
+      <name>.f32   定长 float32 帧，依次追加
+      <name>.ts    每帧的 float64 时间戳 (unix 秒)，与帧一一对应
+      <name>.json  段元数据：频点数、起始频率、频率步进
+    读取时通过 numpy.memmap 按时间戳二分查找后切片，不会把整个文件读入内存。
+    频点数 / 起始频率 / 步进变化，或当前段超过 segment_bytes 时开始新段；
+    retain() 按总大小和时间删除最旧的段。
+    """
+
+    def __init__(self, root: str, base_url: str, segment_bytes: int = None):
+        self.base_url = base_url
+        self.path = os.path.join(root, re.sub(r'[^A-Za-z0-9.-]+', '_', base_url.split('://')[-1]))
+        self.segment_bytes = segment_bytes or Config.SPECTRUM_ARCHIVE_SEGMENT_BYTES
+        os.makedirs(self.path, exist_ok=True)
+
+    def segments(self) -> list:
+        """按时间顺序返回所有段名。"""
+        names = [name[:-5] for name in os.listdir(self.path) if name.endswith('.json')]
+        return sorted(names, key=lambda name: int(name.split('-')[0]))
+
+    def _meta(self, name: str) -> dict:
+        with open(os.path.join(self.path, name + '.json')) as f:
+            return json.load(f)
+
+    def _count(self, name: str, bins: int) -> int:
+        # 帧先于时间戳写入，两者取较小值，进程中途退出时不会读到半帧
+        frames = os.path.getsize(os.path.join(self.path, name + '.f32')) // (4 * bins)
+        stamps = os.path.getsize(os.path.join(self.path, name + '.ts')) // 8
+        return min(frames, stamps)
+
+    def _repair(self, name: str, bins: int):
+        """把 .f32 / .ts 截断到两者都完整的帧数，去掉中途退出留下的半帧或没有时间戳的孤立帧。"""
+        count = self._count(name, bins)
+        for ext, size in (('.f32', count * bins * 4), ('.ts', count * 8)):
+            path = os.path.join(self.path, name + ext)
+            if os.path.getsize(path) != size:
+                os.truncate(path, size)
+
+    def _open_segment(self, name: str):
+        """以只读 memmap 打开一个段，返回 (时间戳, 帧矩阵, 元数据)；空段返回 None。"""
+        meta = self._meta(name)
+        count = self._count(name, meta['bins'])
+        if count == 0:
+            return None
+        stamps = np.memmap(os.path.join(self.path, name + '.ts'), dtype='<f8', mode='r', shape=(count,))
+        frames = np.memmap(os.path.join(self.path, name + '.f32'), dtype='<f4', mode='r', shape=(count, meta['bins']))
+        return stamps, frames, meta
+
+    def append(self, samples: np.ndarray, start: float, step: float, ts: float = None):
+        """
+        追加一帧频谱。
+        Args:
+            samples (np.ndarray): 频谱采样。
+            start (float): 起始频率。
+            step (float): 频率步进。
+            ts (float, optional): unix 时间戳，默认当前时间。
+        """
+        ts = time.time() if ts is None else ts
+        samples = np.ascontiguousarray(samples, dtype='<f4')
+        meta = {'bins': int(samples.size), 'start': float(start), 'step': float(step)}
+
+        segments = self.segments()
+        name = segments[-1] if segments else None
+        if name is not None:
+            # 上次追加若在写帧与写时间戳之间中断，先对齐两个文件，否则之后的帧与时间戳会错位
+            self._repair(name, self._meta(name)['bins'])
+        if name is None or self._meta(name) != meta \
+                or os.path.getsize(os.path.join(self.path, name + '.f32')) >= self.segment_bytes:
+            name = f"{int(ts * 1000)}-{meta['bins']}"
+            # 数据文件先于元数据创建，segments() 列出的段总有 .f32 / .ts
+            for ext in ('.f32', '.ts'):
+                open(os.path.join(self.path, name + ext), 'ab').close()
+            with open(os.path.join(self.path, name + '.json'), 'w') as f:
+                json.dump(meta, f)
+
+        with open(os.path.join(self.path, name + '.f32'), 'ab') as f:
+            f.write(samples.tobytes())
+        with open(os.path.join(self.path, name + '.ts'), 'ab') as f:
+            f.write(np.float64(ts).astype('<f8').tobytes())
+
+    def query(self, t0: float, t1: float):
+        """
+        按时间范围 [t0, t1] 读取帧，逐段返回 memmap 切片，不复制数据。
+        Yields:
+            tuple: (时间戳数组, 帧矩阵 (n, bins), 段元数据)
+        """
+        segments = self.segments()
+        starts = [int(name.split('-')[0]) / 1000 for name in segments]
+        for i, name in enumerate(segments):
+            # 段名前缀是第一帧的时间：下一段在 t0 之前开始的段整体早于 t0，晚于 t1 开始的段之后都不需要
+            if starts[i] > t1:
+                break
+            if i + 1 < len(segments) and starts[i + 1] <= t0:
+                continue
+            segment = self._open_segment(name)
+            if segment is None:
+                continue
+            stamps, frames, meta = segment
+            lo = np.searchsorted(stamps, t0, side='left')
+            hi = np.searchsorted(stamps, t1, side='right')
+            if lo < hi:
+                yield stamps[lo:hi], frames[lo:hi], meta
+
+    def last_ts(self) -> float:
+        """最后一帧的时间戳，归档为空时返回 None。"""
+        for name in reversed(self.segments()):
+            segment = self._open_segment(name)
+            if segment is not None:
+                return float(segment[0][-1])
+        return None
+
+    def replay(self, t0: float, t1: float, speed: float = None):
+        """
+        回放时间范围内的帧，逐帧生成。
+        Args:
+            speed (float, optional): 回放倍速，按原始帧间隔等待；默认不等待。
+        Yields:
+            tuple: (时间戳, float32 频谱帧, 起始频率, 频率步进)
+        """
+        previous = None
+        for stamps, frames, meta in self.query(t0, t1):
+            for ts, frame in zip(stamps, frames):
+                if speed and previous is not None:
+                    time.sleep(max(0.0, (ts - previous) / speed))
+                previous = ts
+                yield float(ts), np.array(frame), meta['start'], meta['step']
+
+    def size(self) -> int:
+        """归档占用的字节数。"""
+        return sum(os.path.getsize(os.path.join(self.path, name)) for name in os.listdir(self.path))
+
+    def _delete(self, name: str):
+        for ext in ('.json', '.f32', '.ts'):
+            try:
+                os.remove(os.path.join(self.path, name + ext))
+            except FileNotFoundError:
+                pass
+
+    def retain(self, max_bytes: int = None, max_age: float = None) -> int:
+        """
+        删除最旧的段，直到总大小不超过 max_bytes 且不保留早于 max_age 秒之前结束的段。
+        正在写入的最后一段始终保留。
+        Returns:
+            int: 删除的段数量。
+        """
+        max_bytes = max_bytes or Config.SPECTRUM_ARCHIVE_MAX_BYTES
+        max_age = max_age or Config.SPECTRUM_ARCHIVE_MAX_AGE
+        cutoff = time.time() - max_age
+
+        removed = 0
+        segments = self.segments()
+        total = self.size()
+        for name in segments[:-1]:
+            segment = self._open_segment(name)
+            expired = segment is None or float(segment[0][-1]) < cutoff
+            if not expired and total <= max_bytes:
+                break
+            seg_bytes = sum(os.path.getsize(os.path.join(self.path, name + ext)) for ext in ('.json', '.f32', '.ts'))
+            del segment
+            self._delete(name)
+            total -= seg_bytes
+            removed += 1
+        return removed
+
+def get_archive(base_url: str) -> SpectrumArchive:
+    """返回 base_url 对应的归档 (位于 Config.SPECTRUM_ARCHIVE_DIR)。"""
+    return SpectrumArchive(Config.SPECTRUM_ARCHIVE_DIR, base_url.rstrip('/'))
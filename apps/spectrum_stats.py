@@ -0,0 +1,128 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+"""
+
+import time
+import threading
+import numpy as np
+
+from apps.config import Config
+
+TRACES = ('avg', 'peak', 'min')
+
+class SpectrumStats:
+    """
+    单个节点的增量频谱统计，每来一帧 O(频点数) 更新，内存固定：
+      - avg:  指数加权平均 (EWMA)
+      - peak: 峰值保持
+      - min:  最小值保持
+      - 分位数: 每个频点一个固定电平区间的直方图 (lo..hi, 步长 resolution)，
+                计数按 decay 衰减，近期样本权重更高，分位数由累计直方图近似得到。
+    频点数、起始频率或步进变化时自动重置。线程安全。
+    帧来自两个来源：实时推送线程 (apps.stream，有人观看时每 STREAM_INTERVAL 秒一帧)，以及
+    catch_up() 从频谱归档补上的帧 (archive_spectrum 任务与观看者无关地每 SPECTRUM_ARCHIVE_INTERVAL 秒一帧)；
+    last_ts 记录已计入的最新帧时间，归档中更早的帧不会重复计入。
+    """
+
+    def __init__(self, alpha: float = None, lo: float = None, hi: float = None,
+                 resolution: float = None, decay: float = None):
+        self.alpha = alpha or Config.SPECTRUM_STATS_ALPHA
+        self.lo = Config.SPECTRUM_STATS_RANGE[0] if lo is None else lo
+        self.hi = Config.SPECTRUM_STATS_RANGE[1] if hi is None else hi
+        self.resolution = resolution or Config.SPECTRUM_STATS_RESOLUTION
+        self.decay = decay or Config.SPECTRUM_STATS_DECAY
+        self.levels = int(np.ceil((self.hi - self.lo) / self.resolution))
+
+        self._lock = threading.Lock()
+        self._catch_up_lock = threading.Lock()
+        self.last_ts = 0.0
+        self.reset()
+
+    def reset(self, bins: int = 0, start: float = 0.0, step: float = 0.0):
+        with self._lock:
+            self.bins, self.start, self.step = bins, start, step
+            self.frames = 0
+            self.avg = np.zeros(bins, dtype=np.float32)
+            self.peak = np.full(bins, -np.inf, dtype=np.float32)
+            self.min = np.full(bins, np.inf, dtype=np.float32)
+            self.histogram = np.zeros((bins, self.levels), dtype=np.float32)
+
+    def update(self, samples: np.ndarray, start: float, step: float, ts: float = None):
+        """用一帧新频谱更新所有统计量，ts 为帧的 unix 时间，默认当前时间。"""
+        self.last_ts = time.time() if ts is None else ts
+        samples = np.asarray(samples, dtype=np.float32)
+        if samples.size != self.bins or start != self.start or step != self.step:
+            self.reset(samples.size, start, step)
+
+        with self._lock:
+            if self.frames == 0:
+                self.avg[:] = samples
+            else:
+                self.avg += self.alpha * (samples - self.avg)
+            np.maximum(self.peak, samples, out=self.peak)
+            np.minimum(self.min, samples, out=self.min)
+
+            if self.decay < 1.0:
+                self.histogram *= self.decay
+            level = np.clip(((samples - self.lo) / self.resolution).astype(np.int64), 0, self.levels - 1)
+            self.histogram[np.arange(self.bins), level] += 1.0
+            self.frames += 1
+
+    def catch_up(self, archive, max_age: float = None) -> int:
+        """
+        把归档中晚于 last_ts 的帧依次计入，最多回溯 max_age 秒 (默认 Config.SPECTRUM_STATS_CATCHUP)。
+        Returns:
+            int: 计入的帧数。
+        """
+        max_age = Config.SPECTRUM_STATS_CATCHUP if max_age is None else max_age
+        count = 0
+        with self._catch_up_lock:
+            now = time.time()
+            since = max(self.last_ts, now - max_age)
+            for stamps, frames, meta in archive.query(np.nextafter(since, np.inf), now):
+                for ts, frame in zip(stamps, frames):
+                    self.update(frame, meta['start'], meta['step'], float(ts))
+                count += len(stamps)
+        return count
+
+    def percentile(self, q: float) -> np.ndarray:
+        """
+        近似的逐频点分位数。
+        Args:
+            q (float): 0-100 之间的百分位。
+        Returns:
+            np.ndarray: float32 数组，取所在电平区间的中点。
+        """
+        with self._lock:
+            cdf = np.cumsum(self.histogram, axis=1)
+            target = cdf[:, -1:] * (q / 100.0)
+            level = np.argmax(cdf >= target, axis=1)
+        return (self.lo + (level + 0.5) * self.resolution).astype(np.float32)
+
+    def trace(self, name: str) -> np.ndarray:
+        """
+        按名称返回统计曲线：avg / peak / min，或 pNN 形式的分位数 (例如 p90)。
+        Raises:
+            ValueError: 未知的名称，或尚未收到任何帧。
+        """
+        if self.frames == 0:
+            raise ValueError("尚无频谱统计数据")
+        if name in TRACES:
+            with self._lock:
+                return getattr(self, name).copy()
+        if name.startswith('p') and name[1:].replace('.', '', 1).isdigit() and 0 <= float(name[1:]) <= 100:
+            return self.percentile(float(name[1:]))
+        raise ValueError(f"未知的统计曲线: {name}，可选 {', '.join(TRACES)} 或 p0-p100")
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+def get_spectrum_stats(base_url: str) -> SpectrumStats:
+    """返回 base_url 对应的共享 SpectrumStats。"""
+    key = base_url.rstrip('/')
+    with _stats_lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = SpectrumStats()
+        return stats
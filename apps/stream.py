@@ -0,0 +1,152 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+"""
+
+import json
+import time
+import base64
+import threading
+from queue import Queue, Full, Empty
+
+from apps.config import Config
+from apps.meshapi import get_meshapi
+from apps.spectrum import parse_spectrum, encode_spectrum, decimate_spectrum
+from apps.spectrum_stats import get_spectrum_stats
+
+def sse_message(event: str, data: dict) -> str:
+    """按 Server-Sent Events 格式编码一条消息。"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'), ensure_ascii=False)}\n\n"
+
+def diff_fields(old: dict, new: dict) -> tuple:
+    """
+    计算两个状态字典的顶层差异。
+    Returns:
+        tuple: (changed 变化或新增的字段, removed 被删除的字段名列表)
+    """
+    changed = {key: value for key, value in new.items() if key not in old or old[key] != value}
+    removed = [key for key in old if key not in new]
+    return changed, removed
+
+class DeviceStream:
+    """
+    单个设备的实时推送源：一个后台线程按固定间隔轮询 status 与 spectrum，
+    把相对上一帧的变化编码一次后广播给所有订阅者。上游请求量与在线观看人数无关。
+    没有订阅者超过 idle_timeout 秒后，线程自动退出。
+    """
+
+    def __init__(self, base_url: str, interval: float = None, idle_timeout: float = 30):
+        self.base_url = base_url
+        self.interval = interval or Config.STREAM_INTERVAL
+        self.idle_timeout = idle_timeout
+
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._state = {'status': {}, 'spectrum': None, 'traces': {}}
+
+    def subscribe(self, maxsize: int = 16) -> Queue:
+        """注册订阅者，返回接收 SSE 消息的队列；首条消息为完整状态。"""
+        queue = Queue(maxsize=maxsize)
+        with self._lock:
+            queue.put_nowait(sse_message('full', self._state))
+            self._subscribers.add(queue)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f'stream-{self.base_url}', daemon=True)
+                self._thread.start()
+        return queue
+
+    def unsubscribe(self, queue: Queue):
+        with self._lock:
+            self._subscribers.discard(queue)
+
+    def _broadcast(self, message: str):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        full = None
+        for queue in subscribers:
+            try:
+                queue.put_nowait(message)
+            except Full:
+                # 慢客户端：积压的增量丢掉任何一条都会让客户端状态错位，清空队列改发一份当前完整状态，
+                # 客户端据此整体重建；不阻塞轮询线程
+                if full is None:
+                    with self._lock:
+                        full = sse_message('full', self._state)
+                try:
+                    while True:
+                        queue.get_nowait()
+                except Empty:
+                    pass
+                try:
+                    queue.put_nowait(full)
+                except Full:
+                    pass
+
+    def _poll(self) -> dict:
+        # 本线程就是这个设备唯一的实时轮询者，不经过 meshcache：缓存的 status 可能是 TTL + stale 秒之前的
+        client = get_meshapi(self.base_url)
+        status = client.get_status()
+        samples, start, step = parse_spectrum(client.get_spectrum())
+
+        # 统计量在完整分辨率上更新，平均 / 峰值保持曲线与实时频谱使用相同的抽稀下标
+        stats = get_spectrum_stats(self.base_url)
+        stats.update(samples, start, step)
+        decimated, index = decimate_spectrum(samples, Config.STREAM_SPECTRUM_POINTS)
+
+        def encode(values):
+            return base64.b64encode(encode_spectrum(values, start, step, index)).decode('ascii')
+
+        traces = {}
+        for name in ('avg', 'peak'):
+            trace = stats.trace(name)
+            traces[name] = encode(trace if index is None else trace[index])
+        return {'status': status, 'spectrum': encode(decimated), 'traces': traces}
+
+    def _run(self):
+        idle_since = None
+        while True:
+            with self._lock:
+                if self._subscribers:
+                    idle_since = None
+                elif idle_since is None:
+                    idle_since = time.monotonic()
+                elif time.monotonic() - idle_since > self.idle_timeout:
+                    self._thread = None
+                    return
+
+            started = time.monotonic()
+            try:
+                frame = self._poll()
+            except Exception as e:
+                self._broadcast(sse_message('error', {'message': str(e)}))
+            else:
+                changed, removed = diff_fields(self._state['status'], frame['status'])
+                delta = {}
+                if changed or removed:
+                    delta['status'] = changed
+                    if removed:
+                        delta['removed'] = removed
+                if frame['spectrum'] != self._state['spectrum']:
+                    delta['spectrum'] = frame['spectrum']
+                if frame['traces'] != self._state['traces']:
+                    delta['traces'] = frame['traces']
+
+                with self._lock:
+                    self._state = frame
+                if delta:
+                    self._broadcast(sse_message('delta', delta))
+
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+_streams = {}
+_streams_lock = threading.Lock()
+
+def get_device_stream(base_url: str) -> DeviceStream:
+    """返回 base_url 对应的共享 DeviceStream。"""
+    key = base_url.rstrip('/')
+    with _streams_lock:
+        stream = _streams.get(key)
+        if stream is None:
+            stream = _streams[key] = DeviceStream(key)
+        return stream
@@ -3,8 +3,9 @@
 Copyright (c) 2019 - present AppSeed.us
 """
 
-import json, time
+import os, json, time, uuid
 from datetime import datetime
+from contextlib import contextmanager
 
 from apps.config import *
 
@@ -22,9 +23,79 @@ celery_app.conf.beat_schedule = {
         'schedule': crontab(minute='*/1'),  # Runs every 1 minute
         'args': (json.dumps({'test': 'data'}),)
     },
+    'rollup_telemetry_every_minute': {
+        'task': 'rollup_telemetry',
+        'schedule': crontab(minute='*/1'),
+    },
+    'archive_spectrum': {
+        'task': 'archive_spectrum',
+        'schedule': Config.SPECTRUM_ARCHIVE_INTERVAL,
+    },
+    'detect_interference': {
+        'task': 'detect_interference',
+        'schedule': Config.INTERFERENCE_INTERVAL,
+    },
 }
+# fixed-interval collection, unless the adaptive scheduler worker (apps.scheduler) does the polling
+if not Config.TELEMETRY_ADAPTIVE:
+    celery_app.conf.beat_schedule['collect_telemetry'] = {
+        'task': 'collect_telemetry',
+        'schedule': Config.TELEMETRY_INTERVAL,
+    }
 celery_app.conf.timezone = 'UTC'
 
+_flask_app = None
+
+def flask_app():
+    """ Lazily build the Flask app so tasks can use the DB (app context) """
+    global _flask_app
+    if _flask_app is None:
+        from apps import create_app
+        debug = (os.getenv('DEBUG', 'False') == 'True')
+        _flask_app = create_app(config_dict['Debug' if debug else 'Production'])
+    return _flask_app
+
+_telemetry_poller = None
+
+def telemetry_poller():
+    """ Fleet poller owned by the worker, bypassing the dashboard cache for fresh readings """
+    global _telemetry_poller
+    if _telemetry_poller is None:
+        from apps.fleet import FleetPoller
+        _telemetry_poller = FleetPoller(use_cache=False)
+    return _telemetry_poller
+
+_owner = None
+
+def worker_token():
+    """ Identifies this worker process (prefork children fork after import, so the pid is checked) """
+    global _owner
+    if _owner is None or _owner[0] != os.getpid():
+        _owner = (os.getpid(), f'{os.getpid()}:{uuid.uuid4()}')
+    return _owner[1]
+
+_redis = None
+
+def redis_client():
+    """ Redis connection on the broker, used for task locks and run stats """
+    global _redis
+    if _redis is None:
+        import redis
+        _redis = redis.Redis.from_url(Config.CELERY_BROKER_URL)
+    return _redis
+
+@contextmanager
+def task_lock( name, ttl ):
+    """ Redis lock so a periodic task never overlaps its previous run; yields False when already held """
+    key      = 'lock:' + name
+    token    = str(uuid.uuid4())
+    acquired = redis_client().set(key, token, nx=True, ex=ttl)
+    try:
+        yield bool(acquired)
+    finally:
+        if acquired and redis_client().get(key) == token.encode():
+            redis_client().delete(key)
+
 
 # task used for tests
 @celery_app.task(name="celery_test", bind=True)
@@ -97,3 +168,236 @@ def celery_test( self, task_input ):
 def celery_beat_test( self, task_input ):
     task_json = {'info': 'Beat is running'}
     return task_json
+
+
+# periodic device telemetry collector
+@celery_app.task(name="collect_telemetry", bind=True)
+def collect_telemetry( self ):
+
+    from apps.fleet import registered_base_urls
+    from apps.telemetry import snapshot_to_rows, store_samples
+    from apps.registry import sync_registry
+    from apps.configqueue import deliver_pending
+    from apps.history import get_history_writer
+    from apps.alerts import get_alert_engine
+
+    ts_start = time.monotonic()
+    with task_lock('collect_telemetry', Config.TELEMETRY_LOCK_TTL) as acquired:
+        # skip this cycle if the previous run still holds the lock
+        if not acquired:
+            logger.warning( '*** collect_telemetry skipped: previous run still in progress' )
+            return {'state': 'SKIPPED'}
+
+        with flask_app().app_context():
+            base_urls = registered_base_urls()
+            snapshot  = telemetry_poller().poll(base_urls)
+            stored    = store_samples( snapshot_to_rows( snapshot ) )
+            ts        = datetime.utcfromtimestamp( snapshot.started )
+            samples   = [(r.base_url, ts, r.data) for r in snapshot.ok]
+            # full status goes to the delta-compressed history
+            history   = get_history_writer().store( samples )
+            # like the adaptive scheduler: an alert failure must not cost the registry sync and config delivery
+            # rule state follows the task across worker processes: take over the last run's state when
+            # another process ran it, hand ours on afterwards (the task lock keeps the runs in sequence)
+            try:
+                engine = get_alert_engine()
+                if redis_client().getset('alerts:owner', worker_token()) != worker_token().encode():
+                    engine.import_state( redis_client().get('alerts:state') )
+                alerts = engine.process( samples )
+                redis_client().set('alerts:state', engine.export_state())
+            except Exception as e:
+                # the next run starts again from the last state that was handed on
+                redis_client().delete('alerts:owner')
+                logger.warning( f'*** collect_telemetry: alert evaluation failed ({e})' )
+                alerts = {'fired': 0, 'cleared': 0}
+            # the same sweep feeds the device registry, nodes discovered here are polled next run
+            registry  = sync_registry( snapshot.node_infos(), ts )
+            # queued config changes go out to the nodes that just answered
+            delivery  = deliver_pending( [r.base_url for r in snapshot.ok] )
+
+    duration = time.monotonic() - ts_start
+    result = {
+        'state'    : 'FINISHED',
+        'nodes'    : len(snapshot.results),
+        'failed'   : len(snapshot.failed),
+        'stored'   : stored,
+        'history'  : history,
+        'alerts_fired'     : alerts['fired'],
+        'alerts_cleared'   : alerts['cleared'],
+        'inserted' : registry['inserted'],
+        'updated'  : registry['updated'],
+        'config_delivered' : delivery['delivered'],
+        'config_failed'    : delivery['failed'],
+        'duration' : round(duration, 3),
+    }
+    redis_client().hset('stats:collect_telemetry', mapping={'ts_end': time.time(), **result})
+
+    if duration > Config.TELEMETRY_INTERVAL:
+        logger.warning( f'*** collect_telemetry took {duration:.1f}s, longer than the {Config.TELEMETRY_INTERVAL}s interval' )
+    logger.info( ' > collect_telemetry: ' + str( result ) )
+
+    return result
+
+
+# incremental telemetry rollups (1m / 1h / 1d), resumes from the stored watermark
+@celery_app.task(name="rollup_telemetry", bind=True)
+def rollup_telemetry( self ):
+
+    from apps.telemetry import rollup_telemetry as run_rollup
+
+    ts_start = time.monotonic()
+    processed = 0
+    with task_lock('rollup_telemetry', Config.TELEMETRY_LOCK_TTL) as acquired:
+        # two overlapping runs would merge the same rows twice
+        if not acquired:
+            logger.warning( '*** rollup_telemetry skipped: previous run still in progress' )
+            return {'state': 'SKIPPED'}
+
+        with flask_app().app_context():
+            # drain the backlog in batches, the watermark advances after each one
+            while True:
+                count = run_rollup()
+                processed += count
+                if count == 0 or time.monotonic() - ts_start > Config.TELEMETRY_INTERVAL:
+                    break
+
+    result = {'state': 'FINISHED', 'processed': processed, 'duration': round(time.monotonic() - ts_start, 3)}
+    logger.info( ' > rollup_telemetry: ' + str( result ) )
+    return result
+
+
+# spectrum sweeps of every node appended to the memory-mapped archive
+@celery_app.task(name="archive_spectrum", bind=True)
+def archive_spectrum( self ):
+
+    from apps.fleet import registered_base_urls
+    from apps.spectrum import parse_spectrum
+    from apps.spectrum_archive import get_archive
+    from apps.waterfall import get_waterfall_renderer
+
+    ts_start = time.monotonic()
+    archived = 0
+    with task_lock('archive_spectrum', Config.TELEMETRY_LOCK_TTL) as acquired:
+        # appends from two overlapping runs would interleave in the same segment
+        if not acquired:
+            logger.warning( '*** archive_spectrum skipped: previous run still in progress' )
+            return {'state': 'SKIPPED'}
+
+        with flask_app().app_context():
+            base_urls = registered_base_urls()
+        snapshot = telemetry_poller().poll(base_urls, 'spectrum')
+
+        for result in snapshot.ok:
+            try:
+                samples, start, step = parse_spectrum( result.data )
+                archive = get_archive( result.base_url )
+                archive.append( samples, start, step, ts=snapshot.started )
+                archive.retain()
+                get_waterfall_renderer().prune( archive )
+                archived += 1
+            except Exception as e:
+                logger.warning( f'*** archive_spectrum {result.base_url}: {e}' )
+
+    result = {'state': 'FINISHED', 'archived': archived, 'failed': len(snapshot.failed),
+              'duration': round(time.monotonic() - ts_start, 3)}
+    logger.info( ' > archive_spectrum: ' + str( result ) )
+    return result
+
+
+# batched interference detection over the newly archived spectrum frames of every node
+@celery_app.task(name="detect_interference", bind=True)
+def detect_interference( self ):
+
+    import numpy as np
+    from sqlalchemy import insert
+    from apps import db
+    from apps.models import InterferenceEvent
+    from apps.fleet import registered_base_urls, poll_fleet
+    from apps.spectrum_archive import get_archive
+    from apps.interference import InterferenceDetector, NodeBaseline, operating_band, state_path
+
+    ts_start = time.monotonic()
+    with task_lock('detect_interference', Config.TELEMETRY_LOCK_TTL) as acquired:
+        if not acquired:
+            logger.warning( '*** detect_interference skipped: previous run still in progress' )
+            return {'state': 'SKIPPED'}
+
+        with flask_app().app_context():
+            base_urls = registered_base_urls()
+
+        # operating channels from two concurrent fleet sweeps, not per-node requests in series
+        statuses = {r.base_url: r.data for r in poll_fleet(base_urls, 'status').ok}
+        configs  = {r.base_url: r.data for r in poll_fleet(base_urls, 'config').ok}
+        bands    = {url: operating_band(statuses[url], configs[url]) for url in statuses if url in configs}
+        bands    = {url: band for url, band in bands.items() if band is not None}
+        for url in set(base_urls) - set(bands):
+            logger.warning( f'*** detect_interference {url}: no operating channel' )
+
+        # per-node baselines persist next to the archive, the lock keeps a single writer
+        detector = InterferenceDetector()
+        archives = {}
+        pending  = {}   # bins -> [nodes, frames, stamps, layouts, count], flushed every INTERFERENCE_BATCH_FRAMES
+        events   = []
+
+        def flush( bins ):
+            nodes, chunks, times, layouts, count = pending.pop(bins)
+            events.extend(detector.process(nodes, np.concatenate(chunks), np.concatenate(times), layouts, bands))
+            return count
+
+        # a node without saved state (or far behind) starts INTERFERENCE_MAX_BACKLOG ago, not at the archive start
+        now, frames_total = time.time(), 0
+        cutoff = now - Config.INTERFERENCE_MAX_BACKLOG
+        for base_url in base_urls:
+            archive = archives[base_url] = get_archive(base_url)
+            if os.path.exists(state_path(archive)):
+                detector.nodes[base_url] = NodeBaseline.load(state_path(archive))
+            since = max(detector.nodes[base_url].last_ts if base_url in detector.nodes else 0.0, cutoff)
+
+            for stamps, frames, meta in archive.query(np.nextafter(since, np.inf), now):
+                for lo in range(0, len(stamps), Config.INTERFERENCE_BATCH_FRAMES):
+                    hi = min(lo + Config.INTERFERENCE_BATCH_FRAMES, len(stamps))
+                    batch = pending.setdefault(meta['bins'], [[], [], [], [], 0])
+                    batch[0].extend([base_url] * (hi - lo))
+                    batch[1].append(np.array(frames[lo:hi]))
+                    batch[2].append(np.array(stamps[lo:hi]))
+                    batch[3].extend([(meta['start'], meta['step'])] * (hi - lo))
+                    batch[4] += hi - lo
+                    if batch[4] >= Config.INTERFERENCE_BATCH_FRAMES:
+                        frames_total += flush(meta['bins'])
+        for bins in list(pending):
+            frames_total += flush(bins)
+
+        for base_url, state in detector.nodes.items():
+            state.save(state_path(archives[base_url]))
+
+        if events:
+            with flask_app().app_context():
+                for event in events:
+                    event['ts'] = datetime.utcfromtimestamp(event['ts'])
+                db.session.execute(insert(InterferenceEvent), events)
+                db.session.commit()
+
+    duration = time.monotonic() - ts_start
+    result = {'state': 'FINISHED', 'frames': frames_total, 'events': len(events), 'duration': round(duration, 3),
+              'frames_per_second': round(frames_total / duration, 1) if duration else None}
+    logger.info( ' > detect_interference: ' + str( result ) )
+    return result
+
+
+# diff-based config push to many nodes, task_input: {"config": {...}, "nodes": [base_url, ...]}
+@celery_app.task(name="push_config", bind=True)
+def push_config( self, task_input ):
+
+    from apps.configpush import push_config as run_push
+
+    task_json = json.loads( task_input )
+    logger.info( ' > push_config: ' + str( task_json ) )
+
+    def progress( result, done, total ):
+        self.update_state(state='PROGRESS',
+                          meta={ 'done': done, 'total': total, 'last': result.to_dict() })
+
+    report = run_push( task_json['nodes'], task_json['config'], progress )
+    logger.info( ' > push_config: ok=%d failed=%d unchanged=%d elapsed=%sms' %
+                 ( report['ok'], report['failed'], report['unchanged'], report['elapsed_ms'] ) )
+    return report
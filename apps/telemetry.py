@@ -0,0 +1,222 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+"""
+
+import json
+import numpy as np
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from apps import db
+from apps.models import DeviceTelemetry, TelemetryRollup, RollupWatermark
+from apps.exceptions.exception import InvalidUsage
+from apps.decimate import lttb
+
+# 聚合分辨率 (由细到粗) -> 时间桶长度 (秒)
+RESOLUTIONS = {'1m': 60, '1h': 3600, '1d': 86400}
+# 参与聚合的数值字段
+ROLLUP_FIELDS = ('battery', 'temp')
+
+_EPOCH = datetime(1970, 1, 1)
+
+def status_to_row(base_url: str, status: dict, ts: datetime = None) -> dict:
+    """
+    将设备 /status 响应转换为 device_telemetry 的一行。
+    Args:
+        base_url (str): 设备地址。
+        status (dict): /status 响应数据。
+        ts (datetime, optional): 采样时间，默认当前 UTC 时间。
+    Returns:
+        dict: 可直接用于批量插入的列字典。
+    """
+    node_infos = status.get('nodeInfos')
+    return {
+        'ts': ts or datetime.utcnow(),
+        'base_url': base_url,
+        'self_id': status.get('selfId'),
+        'battery': status.get('batteryLevel'),
+        'temp': status.get('temp'),
+        'operating_freq': status.get('operatingFreq'),
+        'node_number': status.get('nodeNumber'),
+        'node_infos': None if node_infos is None else json.dumps(node_infos, separators=(',', ':')),
+    }
+
+def store_samples(rows: list) -> int:
+    """
+    用一条 executemany INSERT 批量写入遥测行。需要在 Flask 应用上下文中调用。
+    Returns:
+        int: 写入的行数。
+    """
+    if not rows:
+        return 0
+
+    try:
+        db.session.execute(insert(DeviceTelemetry), rows)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        db.session.close()
+        error = str(e.__dict__.get('orig', e))
+        raise InvalidUsage(error, 422)
+    return len(rows)
+
+def snapshot_to_rows(snapshot) -> list:
+    """将 FleetSnapshot 中成功的节点转换为遥测行，同一轮使用相同的采样时间。"""
+    ts = datetime.utcfromtimestamp(snapshot.started)
+    return [status_to_row(result.base_url, result.data, ts) for result in snapshot.ok]
+
+def bucket_start(ts: datetime, seconds: int) -> datetime:
+    """返回 ts 所在时间桶的起始时间 (UTC)。"""
+    elapsed = int((ts - _EPOCH).total_seconds())
+    return _EPOCH + timedelta(seconds=elapsed - elapsed % seconds)
+
+def _empty_bucket() -> dict:
+    bucket = {'count': 0}
+    for field in ROLLUP_FIELDS:
+        bucket.update({f'{field}_min': None, f'{field}_max': None, f'{field}_sum': None, f'{field}_count': 0})
+    return bucket
+
+def _merge(bucket: dict, other: dict):
+    """把 other 的统计量合并进 bucket (两者结构相同)。"""
+    bucket['count'] += other['count']
+    for field in ROLLUP_FIELDS:
+        if not other[f'{field}_count']:
+            continue
+        if bucket[f'{field}_count']:
+            bucket[f'{field}_min'] = min(bucket[f'{field}_min'], other[f'{field}_min'])
+            bucket[f'{field}_max'] = max(bucket[f'{field}_max'], other[f'{field}_max'])
+            bucket[f'{field}_sum'] += other[f'{field}_sum']
+        else:
+            bucket[f'{field}_min'] = other[f'{field}_min']
+            bucket[f'{field}_max'] = other[f'{field}_max']
+            bucket[f'{field}_sum'] = other[f'{field}_sum']
+        bucket[f'{field}_count'] += other[f'{field}_count']
+
+def _aggregate(rows: list) -> dict:
+    """
+    将原始遥测行聚合到各分辨率的时间桶。
+    Returns:
+        dict: resolution -> {(base_url, bucket): 统计量}
+    """
+    result = {resolution: {} for resolution in RESOLUTIONS}
+    for row in rows:
+        sample = _empty_bucket()
+        sample['count'] = 1
+        for field in ROLLUP_FIELDS:
+            value = getattr(row, field)
+            if value is not None:
+                sample.update({f'{field}_min': value, f'{field}_max': value, f'{field}_sum': value, f'{field}_count': 1})
+
+        for resolution, seconds in RESOLUTIONS.items():
+            key = (row.base_url, bucket_start(row.ts, seconds))
+            buckets = result[resolution]
+            if key not in buckets:
+                buckets[key] = _empty_bucket()
+            _merge(buckets[key], sample)
+    return result
+
+def rollup_telemetry(batch_size: int = 50000, watermark: str = 'telemetry') -> int:
+    """
+    增量聚合：只处理 id 大于水位线的遥测行，与已有时间桶合并后写回，并推进水位线。
+    每次最多处理 batch_size 行；需要在 Flask 应用上下文中调用。
+    Returns:
+        int: 本次处理的原始行数。
+    """
+    mark = db.session.get(RollupWatermark, watermark)
+    if mark is None:
+        mark = RollupWatermark(name=watermark, last_id=0)
+        db.session.add(mark)
+
+    rows = (DeviceTelemetry.query
+            .with_entities(DeviceTelemetry.id, DeviceTelemetry.ts, DeviceTelemetry.base_url,
+                           *(getattr(DeviceTelemetry, field) for field in ROLLUP_FIELDS))
+            .filter(DeviceTelemetry.id > mark.last_id)
+            .order_by(DeviceTelemetry.id)
+            .limit(batch_size)
+            .all())
+    if not rows:
+        db.session.rollback()
+        return 0
+
+    try:
+        for resolution, buckets in _aggregate(rows).items():
+            base_urls = {base_url for base_url, _ in buckets}
+            starts = [start for _, start in buckets]
+            existing = (TelemetryRollup.query
+                        .filter(TelemetryRollup.resolution == resolution,
+                                TelemetryRollup.base_url.in_(base_urls),
+                                TelemetryRollup.bucket >= min(starts),
+                                TelemetryRollup.bucket <= max(starts))
+                        .all())
+            existing = {(rollup.base_url, rollup.bucket): rollup for rollup in existing}
+
+            inserts, updates = [], []
+            for (base_url, start), stats in buckets.items():
+                rollup = existing.get((base_url, start))
+                if rollup is None:
+                    inserts.append(dict(stats, resolution=resolution, base_url=base_url, bucket=start))
+                    continue
+                merged = {column: getattr(rollup, column) for column in stats}
+                _merge(merged, stats)
+                updates.append(dict(merged, id=rollup.id))
+
+            if inserts:
+                db.session.execute(insert(TelemetryRollup), inserts)
+            if updates:
+                db.session.execute(update(TelemetryRollup), updates)
+
+        mark.last_id = rows[-1].id
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        db.session.close()
+        error = str(e.__dict__.get('orig', e))
+        raise InvalidUsage(error, 422)
+    return len(rows)
+
+def pick_resolution(start: datetime, end: datetime, max_points: int) -> str:
+    """选择时间桶数量不超过 max_points 的最细分辨率，都超过时返回最粗的分辨率。"""
+    span = (end - start).total_seconds()
+    for resolution, seconds in RESOLUTIONS.items():
+        if span / seconds <= max_points:
+            return resolution
+    return list(RESOLUTIONS)[-1]
+
+def query_series(base_url: str, field: str, start: datetime, end: datetime, max_points: int = 500) -> dict:
+    """
+    按时间范围读取某个字段的聚合序列，自动选择分辨率使返回点数有上限。
+    Returns:
+        dict: {'resolution': ..., 'points': [{'t', 'min', 'max', 'avg'}, ...]}
+    """
+    if field not in ROLLUP_FIELDS:
+        raise InvalidUsage(f"不支持的字段: {field}", 422)
+
+    resolution = pick_resolution(start, end, max_points)
+    rollups = (TelemetryRollup.query
+               .filter(TelemetryRollup.resolution == resolution,
+                       TelemetryRollup.base_url == base_url,
+                       TelemetryRollup.bucket >= bucket_start(start, RESOLUTIONS[resolution]),
+                       TelemetryRollup.bucket <= end)
+               .order_by(TelemetryRollup.bucket)
+               .all())
+
+    points = []
+    for rollup in rollups:
+        count = getattr(rollup, f'{field}_count')
+        if not count:
+            continue
+        points.append({
+            't': rollup.bucket.isoformat(),
+            'min': getattr(rollup, f'{field}_min'),
+            'max': getattr(rollup, f'{field}_max'),
+            'avg': getattr(rollup, f'{field}_sum') / count,
+        })
+
+    # 最粗的分辨率仍超出点数上限时 (很长的时间范围)，按平均值曲线做 LTTB 抽稀
+    if len(points) > max_points:
+        index = lttb(np.array([point['avg'] for point in points]), max_points)
+        points = [points[i] for i in index]
+    return {'resolution': resolution, 'points': points}
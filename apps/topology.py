@@ -0,0 +1,543 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+"""
+
+import time
+import logging
+import threading
+import numpy as np
+
+from apps.config import Config
+
+logger = logging.getLogger(__name__)
+
+class NodeInfo:
+    """
+    status['nodeInfos'] 中一个节点的紧凑表示。字段名与设备上报的键一致，模板可直接使用。
+    links 为 ((邻居 id, snr, rssi), ...) 元组，设备未上报时为空。
+    """
+    __slots__ = ('id', 'ip', 'latitude', 'longitude', 'altitude', 'resourceRatio', 'links')
+    FIELDS = __slots__
+
+    def __init__(self, id, ip=None, latitude=None, longitude=None, altitude=None, resourceRatio=0.0, links=()):
+        self.id = id
+        self.ip = ip
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude = altitude
+        self.resourceRatio = resourceRatio
+        self.links = links
+
+    @classmethod
+    def from_dict(cls, info: dict) -> "NodeInfo":
+        links = tuple((link.get('id'), link.get('snr'), link.get('rssi')) for link in info.get('links') or ())
+        return cls(info.get('id'), info.get('ip'), info.get('latitude'), info.get('longitude'),
+                   info.get('altitude'), info.get('resourceRatio') or 0.0, links)
+
+    def key(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.FIELDS)
+
+    def __eq__(self, other):
+        return isinstance(other, NodeInfo) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return f"<NodeInfo(id={self.id}, ip='{self.ip}')>"
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in self.FIELDS if name != 'links'}
+        data['links'] = [{'id': id, 'snr': snr, 'rssi': rssi} for id, snr, rssi in self.links]
+        return data
+
+class TopologyDiff:
+    """
+    两次轮询之间的拓扑变化。
+    added / removed 为 NodeInfo 列表；changed 为 {节点 id: {字段: (旧值, 新值)}}。
+    """
+    __slots__ = ('added', 'removed', 'changed')
+
+    def __init__(self, added: list = None, removed: list = None, changed: dict = None):
+        self.added = added or []
+        self.removed = removed or []
+        self.changed = changed or {}
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+    def __repr__(self):
+        return f"<TopologyDiff(added={len(self.added)}, removed={len(self.removed)}, changed={len(self.changed)})>"
+
+    def to_dict(self):
+        return {
+            'added': [node.to_dict() for node in self.added],
+            'removed': [node.id for node in self.removed],
+            'changed': {id: {name: new for name, (old, new) in fields.items()} for id, fields in self.changed.items()},
+        }
+
+class NodeTable:
+    """
+    按节点 id 索引的 NodeInfo 表。相同 id 的重复条目只保留第一条 (与 FleetSnapshot.node_infos 一致)。
+    """
+    __slots__ = ('nodes',)
+
+    def __init__(self, nodes: dict = None):
+        self.nodes = nodes or {}
+
+    @classmethod
+    def from_infos(cls, infos: list, previous: "NodeTable" = None) -> "NodeTable":
+        """
+        由 nodeInfos 字典列表构建。给出 previous 时，内容未变的节点复用上一轮的 NodeInfo 对象，
+        长期稳定的拓扑在多轮之间不会重复占用内存。
+        """
+        old = previous.nodes if previous else {}
+        nodes = {}
+        for info in infos:
+            node = NodeInfo.from_dict(info)
+            if node.id in nodes:
+                continue
+            kept = old.get(node.id)
+            nodes[node.id] = kept if kept is not None and kept == node else node
+        return cls(nodes)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(self.nodes.values())
+
+    def get(self, id):
+        return self.nodes.get(id)
+
+    def sorted(self) -> list:
+        """按 id 排序的节点列表，id 类型不一致时按字符串比较。"""
+        return sorted(self.nodes.values(), key=lambda node: (str(type(node.id)), node.id))
+
+    def diff(self, new: "NodeTable") -> TopologyDiff:
+        """计算从本表到 new 的变化。"""
+        old_ids, new_ids = self.nodes.keys(), new.nodes.keys()
+        added = [new.nodes[id] for id in new_ids - old_ids]
+        removed = [self.nodes[id] for id in old_ids - new_ids]
+        changed = {}
+        for id in old_ids & new_ids:
+            before, after = self.nodes[id], new.nodes[id]
+            if before is after or before == after:
+                continue
+            changed[id] = {name: (getattr(before, name), getattr(after, name)) for name in NodeInfo.FIELDS
+                           if getattr(before, name) != getattr(after, name)}
+        return TopologyDiff(added, removed, changed)
+
+    def apply(self, diff: TopologyDiff) -> "NodeTable":
+        """返回应用 diff 后的新表，本表不变。"""
+        nodes = dict(self.nodes)
+        for node in diff.removed:
+            nodes.pop(node.id, None)
+        for node in diff.added:
+            nodes[node.id] = node
+        for id, fields in diff.changed.items():
+            node = nodes[id]
+            values = {name: getattr(node, name) for name in NodeInfo.FIELDS}
+            values.update({name: new for name, (old, new) in fields.items()})
+            nodes[id] = NodeInfo(**values)
+        return NodeTable(nodes)
+
+def _articulation(adjacency: list) -> tuple:
+    """
+    Tarjan 算法 (迭代实现，避免深度递归) 求无向图的割点与桥，遍历的同时标记连通分量。O(n + m)。
+    Args:
+        adjacency (list): 每个顶点的邻居下标列表。
+    Returns:
+        tuple: (割点下标集合, 桥 [(u, v), ...], 每个顶点所在分量的编号列表)
+    """
+    count = len(adjacency)
+    disc, low, parent, labels = [-1] * count, [0] * count, [-1] * count, [-1] * count
+    points, bridges, clock, component = set(), [], 0, 0
+    for root in range(count):
+        if disc[root] != -1:
+            continue
+        disc[root] = low[root] = clock
+        labels[root] = component
+        clock += 1
+        children = 0
+        stack = [(root, iter(adjacency[root]))]
+        while stack:
+            v, neighbours = stack[-1]
+            for w in neighbours:
+                if disc[w] == -1:
+                    parent[w] = v
+                    disc[w] = low[w] = clock
+                    labels[w] = component
+                    clock += 1
+                    if v == root:
+                        children += 1
+                    stack.append((w, iter(adjacency[w])))
+                    break
+                if w != parent[v]:
+                    low[v] = min(low[v], disc[w])
+            else:
+                stack.pop()
+                if stack:
+                    u = stack[-1][0]
+                    low[u] = min(low[u], low[v])
+                    if low[v] > disc[u]:
+                        bridges.append((u, v))
+                    if u != root and low[v] >= disc[u]:
+                        points.add(u)
+        if children > 1:
+            points.add(root)
+        component += 1
+    return points, bridges, labels
+
+class LinkMetrics:
+    """
+    由 NodeTable 中各节点上报的 links 构建的链路质量图及拓扑指标。图以稀疏形式 (CSR 邻接表) 保存：
+      - 每条无向链路一个 SNR，两个方向都上报时取较差的一个方向，指向表外节点的链路忽略；
+      - 跳数：对邻接表做广度优先搜索，每一跳只访问前沿节点的邻居 (向量化)，单次 O(n + m)；
+        每个节点的离心率 (到同一分量内最远节点的跳数) 用 Takes & Kosters 的上下界剪枝求精确值，
+        通常只需对少数节点做 BFS，最坏 O(n * m)；完整跳数矩阵只在 hops() / to_dict(matrix=True) 时计算；
+      - articulation: 割点 (离开后网络分裂的节点)；bridges: 桥 (断开后网络分裂的链路)；
+      - weakest: SNR 最低的若干条链路，标记是否为桥。
+    下标顺序与 NodeTable.sorted() 一致。
+    """
+    __slots__ = ('ids', 'index', 'edges', 'edge_snr', 'indptr', 'neighbours', 'degree', 'mean_snr',
+                 'eccentricity', 'components', 'articulation', 'bridges', 'weakest')
+
+    def __init__(self, table: NodeTable, weakest: int = None):
+        weakest = Config.TOPOLOGY_WEAKEST_LINKS if weakest is None else weakest
+        self.ids = [node.id for node in table.sorted()]
+        self.index = {id: i for i, id in enumerate(self.ids)}
+        count = len(self.ids)
+
+        rows, cols, values = [], [], []
+        for node in table:
+            i = self.index[node.id]
+            for neighbour, snr, rssi in node.links:
+                j = self.index.get(neighbour)
+                if j is not None and j != i and snr is not None:
+                    rows.append(min(i, j))
+                    cols.append(max(i, j))
+                    values.append(snr)
+        # 同一对节点的多条上报合并为一条链路，取最小 SNR
+        codes = np.asarray(rows, dtype=np.int64) * count + np.asarray(cols, dtype=np.int64)
+        order = np.argsort(codes, kind='stable')
+        codes, values = codes[order], np.asarray(values, dtype=np.float32)[order]
+        first = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if codes.size else np.empty(0, np.int64)
+        self.edges = np.stack([codes[first] // count, codes[first] % count], axis=1).astype(np.int32) \
+            if codes.size else np.empty((0, 2), np.int32)
+        self.edge_snr = np.minimum.reduceat(values, first) if codes.size else np.empty(0, np.float32)
+
+        # CSR 邻接表 (两个方向)
+        src = np.concatenate([self.edges[:, 0], self.edges[:, 1]])
+        dst = np.concatenate([self.edges[:, 1], self.edges[:, 0]])
+        order = np.argsort(src, kind='stable')
+        self.neighbours = dst[order]
+        self.degree = np.bincount(src, minlength=count).astype(np.int64)
+        self.indptr = np.concatenate(([0], np.cumsum(self.degree)))
+        sums = np.bincount(src, weights=np.concatenate([self.edge_snr, self.edge_snr]), minlength=count)
+        self.mean_snr = np.divide(sums, self.degree, out=np.full(count, np.nan), where=self.degree > 0)
+
+        points, bridges, labels = _articulation(
+            [self.neighbours[self.indptr[i]:self.indptr[i + 1]].tolist() for i in range(count)])
+        self.components = (max(labels) + 1) if labels else 0
+        self.articulation = {self.ids[i] for i in points}
+        bridge_set = {(min(u, v), max(u, v)) for u, v in bridges}
+        self.bridges = [(self.ids[u], self.ids[v]) for u, v in sorted(bridge_set)]
+
+        self.eccentricity = self._eccentricities(np.asarray(labels, dtype=np.int64))
+
+        order = np.argsort(self.edge_snr, kind='stable')[:weakest]
+        self.weakest = [{'a': self.ids[self.edges[k, 0]], 'b': self.ids[self.edges[k, 1]],
+                         'snr': round(float(self.edge_snr[k]), 1),
+                         'bridge': (int(self.edges[k, 0]), int(self.edges[k, 1])) in bridge_set} for k in order]
+
+    def _bfs(self, source: int) -> np.ndarray:
+        """
+        单源广度优先搜索，每一跳把前沿节点的邻居从 CSR 中一次取出。
+        Returns:
+            np.ndarray: (n,) int32 跳数，不可达为 -1。
+        """
+        dist = np.full(len(self.ids), -1, dtype=np.int32)
+        dist[source] = 0
+        frontier = np.array([source])
+        level = 0
+        while frontier.size:
+            level += 1
+            counts = self.degree[frontier]
+            total = int(counts.sum())
+            if not total:
+                break
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            reached = self.neighbours[np.repeat(self.indptr[frontier], counts) + offsets]
+            reached = reached[dist[reached] == -1]
+            if not reached.size:
+                break
+            # 重复的下标写入相同的值，去重交给下面的扫描
+            dist[reached] = level
+            frontier = np.flatnonzero(dist == level)
+        return dist
+
+    def _eccentricities(self, labels: np.ndarray) -> np.ndarray:
+        """
+        逐个连通分量求所有节点的精确离心率 (Takes & Kosters, BoundingDiameters)：
+        对节点 v 做一次 BFS 得到 ecc(v) 后，分量内每个 w 满足
+        max(d(v, w), ecc(v) - d(v, w)) <= ecc(w) <= ecc(v) + d(v, w)，上下界相等的节点不再需要 BFS。
+        BFS 的起点交替取上界最大与下界最小的节点。
+        """
+        eccentricity = np.zeros(len(self.ids), dtype=np.int16)
+        for component in np.unique(labels):
+            members = np.flatnonzero(labels == component)
+            if members.size == 1:
+                continue
+            lower = np.zeros(members.size, dtype=np.int64)
+            upper = np.full(members.size, np.iinfo(np.int64).max)
+            pending = np.ones(members.size, dtype=bool)
+            pick_upper = False
+            while pending.any():
+                candidates = np.flatnonzero(pending)
+                if pick_upper:
+                    best = candidates[np.lexsort((-self.degree[members[candidates]], -upper[candidates]))[0]]
+                else:
+                    best = candidates[np.lexsort((-self.degree[members[candidates]], lower[candidates]))[0]]
+                pick_upper = not pick_upper
+                dist = self._bfs(members[best])[members]
+                ecc = int(dist.max())
+                lower = np.maximum(lower, np.maximum(dist, ecc - dist))
+                upper = np.minimum(upper, ecc + dist)
+                lower[best] = upper[best] = ecc
+                pending &= lower != upper
+            eccentricity[members] = lower
+        return eccentricity
+
+    @property
+    def diameter(self) -> int:
+        return int(self.eccentricity.max()) if self.eccentricity.size else 0
+
+    def hops(self, a=None, b=None):
+        """
+        a、b 都给出时返回两节点之间的跳数 (不可达为 -1)；只给 a 时返回 a 到所有节点的跳数数组；
+        都不给时返回完整的 (n, n) 跳数矩阵 (n 次 BFS，只适合小网络)。
+        """
+        if a is None:
+            count = len(self.ids)
+            return np.array([self._bfs(i) for i in range(count)], dtype=np.int16).reshape(count, count)
+        row = self._bfs(self.index[a])
+        return row if b is None else int(row[self.index[b]])
+
+    def snr_matrix(self) -> np.ndarray:
+        """(n, n) float32 SNR 矩阵，无链路为 NaN。"""
+        count = len(self.ids)
+        matrix = np.full((count, count), np.nan, dtype=np.float32)
+        matrix[self.edges[:, 0], self.edges[:, 1]] = self.edge_snr
+        matrix[self.edges[:, 1], self.edges[:, 0]] = self.edge_snr
+        return matrix
+
+    def node(self, id) -> dict:
+        """单个节点的指标：邻居数、平均链路 SNR、离心率、是否割点。"""
+        i = self.index.get(id)
+        if i is None:
+            return None
+        return {'degree': int(self.degree[i]),
+                'snr': None if np.isnan(self.mean_snr[i]) else round(float(self.mean_snr[i]), 1),
+                'eccentricity': int(self.eccentricity[i]), 'articulation': id in self.articulation}
+
+    def to_dict(self, matrix: bool = False) -> dict:
+        """matrix=True 时附带跳数与 SNR 矩阵，节点数超过 Config.TOPOLOGY_MATRIX_MAX 时不附带。"""
+        data = {
+            'nodes': len(self.ids),
+            'links': len(self.edge_snr),
+            'components': self.components,
+            'diameter': self.diameter,
+            'articulation': sorted(self.articulation, key=lambda id: (str(type(id)), id)),
+            'bridges': self.bridges,
+            'weakest': self.weakest,
+        }
+        if matrix and len(self.ids) <= Config.TOPOLOGY_MATRIX_MAX:
+            data['ids'] = self.ids
+            data['hops'] = self.hops().tolist()
+            data['snr'] = [[None if np.isnan(value) else round(float(value), 1) for value in row]
+                           for row in self.snr_matrix()]
+        return data
+
+class TopologyTracker:
+    """
+    保存最近一次的节点表，每轮轮询只计算并返回变化。线程安全。
+    version 在每次拓扑有变化时加一，调用方可以据此判断是否需要刷新。
+    链路指标 (LinkMetrics) 在轮询更新后于后台线程计算，不占用页面请求；计算期间又有新快照时，
+    算完后直接以最新快照再算一次，中间的快照跳过。
+    """
+
+    def __init__(self):
+        self.table = NodeTable()
+        self.version = 0
+        self.last_diff = TopologyDiff()   # 从 version - 1 到 version 的变化
+        self.links_version = 0            # 节点加入 / 离开或链路变化时加一
+        self._lock = threading.Lock()
+        self._metrics = None              # (links_version, LinkMetrics)
+        self._computing = False
+        self._dirty = False
+
+    def update(self, infos: list) -> tuple:
+        """
+        Args:
+            infos (list): 本轮的 nodeInfos 字典列表。
+        Returns:
+            tuple: (新的 NodeTable, TopologyDiff)
+        """
+        with self._lock:
+            table = NodeTable.from_infos(infos, self.table)
+            diff = self.table.diff(table)
+            if not diff.empty:
+                self.table = table
+                self.version += 1
+                self.last_diff = diff
+                if diff.added or diff.removed or any('links' in fields for fields in diff.changed.values()):
+                    self.links_version += 1
+            if self._metrics is None or self._metrics[0] != self.links_version:
+                if self._computing:
+                    self._dirty = True
+                else:
+                    self._computing = True
+                    threading.Thread(target=self._compute_metrics, name='link-metrics', daemon=True).start()
+            return self.table, diff
+
+    def _compute_metrics(self):
+        while True:
+            with self._lock:
+                table, links_version = self.table, self.links_version
+                self._dirty = False
+            try:
+                metrics = LinkMetrics(table)
+            except Exception as e:
+                logger.warning(f"链路指标计算失败: {e}")
+                metrics = None
+            with self._lock:
+                if metrics is not None:
+                    self._metrics = (links_version, metrics)
+                if not self._dirty:
+                    self._computing = False
+                    return
+
+    def link_metrics(self, wait: float = 0.0) -> LinkMetrics:
+        """
+        最近一次算完的 LinkMetrics，每个链路快照 (links_version) 只计算一次，尚未算完时返回 None。
+        Args:
+            wait (float): 最多等待多少秒，让当前快照的计算完成 (小网络通常来得及)。
+        """
+        deadline = time.monotonic() + wait
+        while True:
+            with self._lock:
+                metrics, current = self._metrics, self.links_version
+            if (metrics is not None and metrics[0] == current) or time.monotonic() >= deadline:
+                return metrics[1] if metrics else None
+            time.sleep(0.01)
+
+    def metrics_version(self) -> int:
+        """最近一次算完的 LinkMetrics 对应的 links_version，尚未算完时为 None。"""
+        with self._lock:
+            return self._metrics[0] if self._metrics else None
+
+    def changes_since(self, version: int) -> dict:
+        """
+        供客户端增量刷新：版本相同时只返回版本号，落后一个版本时返回 diff，否则返回完整节点表。
+        """
+        with self._lock:
+            if version == self.version:
+                return {'version': self.version}
+            if version == self.version - 1:
+                return {'version': self.version, 'diff': self.last_diff.to_dict()}
+            return {'version': self.version, 'nodes': [node.to_dict() for node in self.table.sorted()]}
+
+_tracker = TopologyTracker()
+
+def get_topology_tracker() -> TopologyTracker:
+    """进程内共享的拓扑跟踪器 (/devlist 使用)。"""
+    return _tracker
+
+def _benchmark(sizes: tuple = (1000, 10000), change_ratio: float = 0.01, repeat: int = 5):
+    """
+    基准：nodeInfos 字典列表与 NodeTable 的内存占用，以及每轮解析 + 增量比较的耗时
+    (每轮 change_ratio 比例的节点 resourceRatio 变化，另有一个节点加入、一个离开)。
+    """
+    import time
+    import random
+    import tracemalloc
+
+    def make(count: int) -> list:
+        rng = random.Random(count)
+        return [{'id': i, 'ip': f"10.0.{i // 256}.{i % 256}", 'latitude': 39.9 + rng.random() / 10,
+                 'longitude': 116.4 + rng.random() / 10, 'altitude': rng.uniform(20, 300),
+                 'resourceRatio': round(rng.random(), 3),
+                 'links': [{'id': (i + k) % count, 'snr': 20.0, 'rssi': -75.0} for k in (1, 2, 3)]}
+                for i in range(count)]
+
+    print(f"--- NodeInfo 基准 (每轮 {change_ratio:.0%} 节点变化, 重复 {repeat} 次) ---")
+    for count in sizes:
+        tracemalloc.start()
+        infos = make(count)
+        dict_bytes = tracemalloc.get_traced_memory()[0]
+        table = NodeTable.from_infos(infos)
+        table_bytes = tracemalloc.get_traced_memory()[0] - dict_bytes
+        tracemalloc.stop()
+
+        rng = random.Random(0)
+        rounds = []
+        for r in range(repeat):
+            infos = [dict(info) for info in infos[1:]] + [dict(infos[0], id=count + r)]
+            for info in rng.sample(infos, int(count * change_ratio)):
+                info['resourceRatio'] = round(rng.random(), 3)
+            rounds.append(infos)
+
+        tracker = TopologyTracker()
+        tracker.update(make(count))
+        start = time.perf_counter()
+        for infos in rounds:
+            _, diff = tracker.update(infos)
+        incremental = (time.perf_counter() - start) / repeat * 1000
+
+        start = time.perf_counter()
+        for infos in rounds:
+            NodeTable.from_infos(infos)
+        parse = (time.perf_counter() - start) / repeat * 1000
+
+        print(f"{count:6d} 节点: 字典列表 {dict_bytes / 1024:8.1f} KB, NodeTable {table_bytes / 1024:8.1f} KB; "
+              f"仅解析 {parse:6.2f} ms/轮, 解析 + 比较 {incremental:6.2f} ms/轮, 最后一轮 {diff}")
+
+def _benchmark_links(sizes: tuple = (1000, 3000, 10000), degree: float = 12):
+    """
+    基准：随机几何网状网 (单位正方形内距离小于 r 的节点相连，r 使平均邻居数约为 degree) 的 LinkMetrics 计算耗时。
+    """
+    import random
+
+    print(f"--- 链路质量图基准 (平均邻居数约 {degree}) ---")
+    for count in sizes:
+        rng = random.Random(count)
+        radius = (degree / (np.pi * count)) ** 0.5
+        points = [(rng.random(), rng.random()) for _ in range(count)]
+        cells = {}
+        for i, (x, y) in enumerate(points):
+            cells.setdefault((int(x / radius), int(y / radius)), []).append(i)
+        infos = []
+        for i, (x, y) in enumerate(points):
+            cx, cy = int(x / radius), int(y / radius)
+            links = []
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for j in cells.get((cx + dx, cy + dy), ()):
+                        distance = ((x - points[j][0]) ** 2 + (y - points[j][1]) ** 2) ** 0.5
+                        if j != i and distance < radius:
+                            links.append({'id': j, 'snr': round(35 - 30 * distance / radius, 1), 'rssi': -80.0})
+            infos.append({'id': i, 'links': links})
+        table = NodeTable.from_infos(infos)
+
+        start = time.perf_counter()
+        summary = LinkMetrics(table).to_dict()
+        elapsed = time.perf_counter() - start
+        print(f"{count:6d} 节点 {summary['links']:7d} 链路: {elapsed:7.2f} s, 分量 {summary['components']}, "
+              f"直径 {summary['diameter']}, 割点 {len(summary['articulation'])}, 桥 {len(summary['bridges'])}")
+
+if __name__ == "__main__":
+    _benchmark()
+    _benchmark_links()
@@ -0,0 +1,240 @@
+# -*- encoding: utf-8 -*-
+"""
+Copyright (c) 2025 - present AppSeed.us
+"""
+
+import os
+import time
+import zlib
+import struct
+import threading
+import numpy as np
+
+from apps.config import Config
+
+# 类 viridis 的锚点颜色，插值成 256 级查找表
+_ANCHORS = np.array([
+    (68, 1, 84), (72, 40, 120), (62, 74, 137), (49, 104, 142), (38, 130, 142),
+    (31, 158, 137), (53, 183, 121), (110, 206, 88), (181, 222, 43), (253, 231, 37),
+], dtype=np.float64)
+COLORMAP = np.stack([np.interp(np.linspace(0, len(_ANCHORS) - 1, 256), np.arange(len(_ANCHORS)), _ANCHORS[:, c])
+                     for c in range(3)], axis=1).round().astype(np.uint8)
+
+PNG_MIMETYPE = 'image/png'
+
+def encode_png(rgba: np.ndarray, level: int = 6) -> bytes:
+    """将 (高, 宽, 4) uint8 数组编码为 PNG (不做行滤波，zlib 压缩级别 level)，不依赖图像库。"""
+    height, width, _ = rgba.shape
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)  # 每行首字节为滤波类型 0
+    raw[:, 1:] = rgba.reshape(height, -1)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw.tobytes(), level))
+            + chunk(b'IEND', b''))
+
+def colorize(levels: np.ndarray, lo: float, hi: float) -> np.ndarray:
+    """电平矩阵 (dB) 映射为 RGBA；没有数据的位置 (-inf / nan) 透明。"""
+    valid = np.isfinite(levels)
+    index = np.clip((np.where(valid, levels, lo) - lo) * (255.0 / (hi - lo)), 0, 255).astype(np.uint8)
+    rgba = np.empty(levels.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = COLORMAP[index]
+    rgba[..., 3] = np.where(valid, 255, 0)
+    return rgba
+
+def pool_columns(frames: np.ndarray, width: int) -> np.ndarray:
+    """按频率方向把每帧的频点合并到不超过 width 列，每列取最大值，窄带干扰不会被抹掉。"""
+    bins = frames.shape[1]
+    if bins <= width:
+        return frames
+    size = -(-bins // width)
+    return np.maximum.reduceat(frames, np.arange(0, bins, size), axis=1)
+
+class Tile:
+    """一张瀑布图瓦片：PNG 数据及其覆盖的时间 / 频率范围。"""
+    __slots__ = ('png', 'start', 'end', 'freq_start', 'freq_step', 'closed')
+
+    def __init__(self, png: bytes, start: float, end: float, freq_start: float, freq_step: float, closed: bool):
+        self.png, self.start, self.end = png, start, end
+        self.freq_start, self.freq_step, self.closed = freq_start, freq_step, closed
+
+    def headers(self) -> dict:
+        return {
+            'X-Waterfall-Start': f"{self.start:.3f}",
+            'X-Waterfall-End': f"{self.end:.3f}",
+            'X-Waterfall-Freq-Start': repr(self.freq_start),
+            'X-Waterfall-Freq-Step': repr(self.freq_step),
+        }
+
+class WaterfallRenderer:
+    """
+    由频谱归档渲染瀑布图 (时间 x 频率) PNG 瓦片。
+    瓦片按 (节点, 分辨率, 序号) 寻址：分辨率为每行秒数，第 index 张瓦片覆盖
+    [index * rows * resolution, (index + 1) * rows * resolution)，第 0 行最早，时间向下增长。
+    行内多帧取逐频点最大值，没有帧的行透明。
+    归档已写到瓦片结束时间之后的瓦片不会再有新帧 (closed)，渲染一次后存盘，此后直接读文件；
+    仍在增长的瓦片只在内存中缓存 ttl 秒 (默认一个归档周期)。
+    """
+
+    def __init__(self, rows: int = None, width: int = None, levels: tuple = None, ttl: float = None):
+        self.rows = rows or Config.WATERFALL_TILE_ROWS
+        self.width = width or Config.WATERFALL_TILE_WIDTH
+        self.lo, self.hi = levels or Config.WATERFALL_LEVELS
+        self.ttl = Config.SPECTRUM_ARCHIVE_INTERVAL if ttl is None else ttl
+        self._open = {}
+        self._lock = threading.Lock()
+        self.stats = {'disk': 0, 'memory': 0, 'rendered': 0}
+
+    def span(self, resolution: int) -> float:
+        return self.rows * resolution
+
+    def tile_index(self, ts: float, resolution: int) -> int:
+        return int(ts // self.span(resolution))
+
+    def _path(self, archive, resolution: int, index: int) -> str:
+        return os.path.join(archive.path, 'tiles', str(resolution), f"{index}.png")
+
+    def _render(self, archive, resolution: int, index: int) -> Tile:
+        t0 = index * self.span(resolution)
+        t1 = t0 + self.span(resolution)
+        grid = np.full((self.rows, self.width), -np.inf, dtype=np.float32)
+        layout = None
+        for stamps, frames, meta in archive.query(t0, np.nextafter(t1, -np.inf)):
+            # 频点布局以范围内最新的段为准，其他布局的帧忽略
+            if layout != (meta['bins'], meta['start'], meta['step']):
+                layout = (meta['bins'], meta['start'], meta['step'])
+                grid[:] = -np.inf
+            pooled = pool_columns(np.asarray(frames), self.width)
+            rows = ((np.asarray(stamps) - t0) // resolution).astype(np.int64)
+            # 时间戳有序，同一行的帧是连续的一段，reduceat 一次取完每行最大值
+            starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+            block = np.maximum.reduceat(pooled, starts, axis=0)
+            cols = block.shape[1]
+            np.maximum(grid[rows[starts], :cols], block, out=block)
+            grid[rows[starts], :cols] = block
+
+        if layout is None:
+            cols, freq_start, freq_step = 1, 0.0, 0.0
+        else:
+            # 合并后每列覆盖 size 个频点，列频率 = freq_start + 列号 * freq_step
+            bins, freq_start, step = layout
+            size = -(-bins // self.width) if bins > self.width else 1
+            cols, freq_step = -(-bins // size), step * size
+        # 封闭瓦片只渲染一次，压缩得更小；增长中的瓦片会反复渲染，用最快的压缩级别
+        closed = (archive.last_ts() or 0.0) >= t1
+        png = encode_png(colorize(grid[:, :cols], self.lo, self.hi), 6 if closed else 1)
+        self.stats['rendered'] += 1
+        return Tile(png, t0, t1, freq_start, freq_step, closed)
+
+    def tile(self, archive, resolution: int, index: int) -> Tile:
+        """
+        返回一张瓦片，依次查找磁盘缓存、内存缓存，都没有时渲染。
+        Args:
+            archive (SpectrumArchive): 节点的频谱归档。
+            resolution (int): 每行秒数。
+            index (int): 瓦片序号。
+        """
+        path = self._path(archive, resolution, index)
+        try:
+            with open(path, 'rb') as f:
+                png = f.read()
+            with open(path[:-4] + '.json') as f:
+                freq_start, freq_step = map(float, f.read().split())
+            self.stats['disk'] += 1
+            t0 = index * self.span(resolution)
+            return Tile(png, t0, t0 + self.span(resolution), freq_start, freq_step, True)
+        except (FileNotFoundError, ValueError):
+            pass
+
+        key = (archive.base_url, resolution, index)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._open.get(key)
+            if cached and cached[0] > now:
+                self.stats['memory'] += 1
+                return cached[1]
+
+        tile = self._render(archive, resolution, index)
+        if tile.closed:
+            # 先写布局再原子替换 PNG，读到 PNG 时布局文件一定存在
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path[:-4] + '.json', 'w') as f:
+                f.write(f"{tile.freq_start!r} {tile.freq_step!r}")
+            with open(path + '.tmp', 'wb') as f:
+                f.write(tile.png)
+            os.replace(path + '.tmp', path)
+        with self._lock:
+            if tile.closed:
+                self._open.pop(key, None)
+            else:
+                # 过期的条目顺手清理，内存缓存不会无限增长
+                self._open = {k: v for k, v in self._open.items() if v[0] > now}
+                self._open[key] = (now + self.ttl, tile)
+        return tile
+
+    def prune(self, archive, max_age: float = None) -> int:
+        """删除结束时间早于 max_age 秒之前的磁盘瓦片 (与归档保留期一致)，返回删除的文件数。"""
+        max_age = max_age or Config.SPECTRUM_ARCHIVE_MAX_AGE
+        cutoff = time.time() - max_age
+        removed = 0
+        root = os.path.join(archive.path, 'tiles')
+        if not os.path.isdir(root):
+            return 0
+        for resolution in os.listdir(root):
+            folder = os.path.join(root, resolution)
+            for name in os.listdir(folder):
+                index = name.split('.')[0]
+                if index.lstrip('-').isdigit() and (int(index) + 1) * self.span(int(resolution)) < cutoff:
+                    os.remove(os.path.join(folder, name))
+                    removed += 1
+        return removed
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+def get_waterfall_renderer() -> WaterfallRenderer:
+    """进程内共享的瀑布图渲染器。"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = WaterfallRenderer()
+        return _renderer
+
+def _benchmark(bins: int = 4096, hours: float = 1.0):
+    """
+    基准：写入 hours 小时 (每 SPECTRUM_ARCHIVE_INTERVAL 秒一帧) 的合成频谱，
+    分别测量首次渲染和命中磁盘缓存的瓦片耗时。
+    """
+    import tempfile
+    from apps.spectrum_archive import SpectrumArchive
+
+    rng = np.random.default_rng(0)
+    interval = Config.SPECTRUM_ARCHIVE_INTERVAL
+    with tempfile.TemporaryDirectory() as root:
+        archive = SpectrumArchive(root, 'http://bench')
+        base = 1_700_000_000.0
+        for i in range(int(hours * 3600 / interval)):
+            frame = rng.normal(-100, 3, bins).astype(np.float32)
+            frame[bins // 3] += 30
+            archive.append(frame, 2.4e9, 1e4, ts=base + i * interval)
+
+        renderer = WaterfallRenderer(ttl=0)
+        resolution = int(interval)
+        first = renderer.tile_index(base, resolution)
+        last = renderer.tile_index(base + hours * 3600, resolution)
+
+        print(f"--- 瀑布图基准 ({bins} 频点, {hours} 小时, 每行 {resolution} 秒) ---")
+        # 最后一张瓦片仍在增长 (ttl=0 时每次都重新渲染)，其余的首次渲染后存盘
+        for label, indexes in (('封闭瓦片 渲染', range(first, last)), ('封闭瓦片 缓存', range(first, last)),
+                               ('增长中瓦片 渲染', [last])):
+            start = time.perf_counter()
+            sizes = [len(renderer.tile(archive, resolution, index).png) for index in indexes]
+            elapsed = (time.perf_counter() - start) * 1000 / len(sizes)
+            print(f"{label}: {elapsed:7.2f} ms/张, 共 {len(sizes)} 张, 平均 {sum(sizes) / len(sizes) / 1024:.1f} KB")
+        print(renderer.stats)
+
+if __name__ == "__main__":
+    _benchmark()
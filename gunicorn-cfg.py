@@ -5,6 +5,13 @@ Copyright (c) 2019 - present AppSeed.us
 
 bind = '0.0.0.0:5005'
 workers = 1
+# SSE streams (/device/stream) hold a connection open, serve them from threads.
+# Every open stream pins one thread for as long as the page is open, so at most
+# workers * threads viewers (minus headroom for ordinary requests) can watch live
+# at once; beyond that every request queues. Raise threads (or workers) with the
+# expected number of concurrent viewers.
+worker_class = 'gthread'
+threads = 16
 accesslog = '-'
 loglevel = 'debug'
 capture_output = True